@@ -0,0 +1,358 @@
+"""
+Benchmark riproducibile di FolderSynchronizer.
+
+Genera alberi sintetici di forme diverse, li sincronizza in vari scenari e misura separatamente
+le fasi "trova_file_da_sincronizzare", "verifica_con_hash", copia, "trova_file_da_eliminare" ed eliminazione.
+I risultati vengono aggiunti ad un file JSON Lines insieme al commit git, così da poter confrontare commit diversi.
+
+Esempi:
+    python benchmark.py                                  #Tutte le forme e gli scenari, modalità mtime e hash
+    python benchmark.py --forme piccoli --workers 4 8    #Confronta il numero di worker
+    python benchmark.py --confronta                      #Confronta gli ultimi due commit misurati
+    python benchmark.py --confronta abc1234 def5678      #Confronta due commit specifici
+"""
+
+import os                 #Modulo standard pensato per interagire con il sistema operativo (OS)
+import json               #Modulo standard per salvare i risultati
+import time               #Modulo standard pensato per lavorare con il tempo
+import random             #Modulo standard per generare alberi sintetici riproducibili
+import shutil             #Modulo standard pensato per operazioni di "alto livello" con i file
+import platform           #Modulo standard per descrivere la macchina su cui gira il benchmark
+import argparse           #Modulo standard per gli argomenti da riga di comando
+import statistics         #Modulo standard per mediana e minimo delle ripetizioni
+import subprocess         #Modulo standard per leggere il commit git corrente
+import contextlib         #Modulo standard per silenziare l'output del sincronizzatore durante le misure
+from datetime import datetime
+
+from folder_sync import FolderSynchronizer
+
+#Fasi misurate, nell'ordine in cui vengono eseguite
+FASI = ("trova_file_da_sincronizzare", "verifica_con_hash", "copia", "trova_file_da_eliminare", "eliminazione")
+
+SCENARI = ("iniziale", "invariato", "modificato")  #Destinazione vuota, identica, oppure in parte diversa dalla sorgente
+
+
+# ==================== ALBERI SINTETICI ======================
+
+def forma_piccoli(rnd, scala):
+    #Molti file minuscoli distribuiti in molte cartelle
+    return [(os.path.join(f"d{i % 200:03d}", f"f{i}.txt"), rnd.randint(0, 4096)) for i in range(int(20000 * scala))]
+
+
+def forma_grandi(rnd, scala):
+    #Pochi file enormi nella radice
+    return [(f"grande{i}.bin", int(128 * 1024 ** 2 * scala)) for i in range(4)]
+
+
+def forma_profondo(rnd, scala):
+    #Catena di cartelle annidate, con qualche file per livello e due rami per livello
+    files = []
+    for livello in range(int(40 * scala) or 1):
+        cartella = os.path.join(*(f"l{n}" for n in range(livello + 1)))
+        for ramo in ("", "x", "y"):
+            for i in range(10):
+                files.append((os.path.join(cartella, ramo, f"f{i}.dat"), rnd.randint(1024, 32 * 1024)))
+    return files
+
+
+def forma_mista(rnd, scala):
+    #Dimensioni log-normali, come un tipico albero di documenti e media
+    return [(os.path.join(f"d{i % 50}", f"s{i % 7}", f"m{i}.bin"), min(int(rnd.lognormvariate(10, 2.5)), 256 * 1024 ** 2))
+            for i in range(int(3000 * scala))]
+
+
+FORME = {"piccoli": forma_piccoli, "grandi": forma_grandi, "profondo": forma_profondo, "mista": forma_mista}
+
+
+def scrivi_file(percorso, dimensione, blocco):
+    """Scrive un file della dimensione indicata; il percorso in testa rende diverso il contenuto di ogni file."""
+    os.makedirs(os.path.dirname(percorso), exist_ok=True)
+
+    with open(percorso, "wb") as f:
+        intestazione = os.fsencode(percorso)[:dimensione]
+        f.write(intestazione)
+        rimanenti = dimensione - len(intestazione)
+
+        while rimanenti > 0:
+            scritti = f.write(blocco[:rimanenti])
+            rimanenti -= scritti
+
+
+def genera_sorgente(cartella, forma, scala, seme):
+    """
+    Genera l'albero sorgente di una forma, se non è già presente (la generazione è deterministica).
+
+    Returns:
+        Tupla (numero di file, byte totali)
+    """
+    rnd = random.Random(seme)
+    files = FORME[forma](rnd, scala)
+    totale = sum(dimensione for _, dimensione in files)
+    segnaposto = os.path.join(cartella, ".generato")
+
+    if os.path.exists(segnaposto):
+        return len(files), totale
+
+    shutil.rmtree(cartella, ignore_errors=True)
+    blocco = rnd.randbytes(1024 ** 2) if hasattr(rnd, "randbytes") else bytes(rnd.getrandbits(8) for _ in range(1024 ** 2))
+
+    for rel_path, dimensione in files:
+        scrivi_file(os.path.join(cartella, rel_path), dimensione, blocco)
+
+    with open(segnaposto, "w") as f:
+        f.write(f"{forma} {scala} {seme}\n")
+
+    return len(files), totale
+
+
+def prepara_destinazione(sorgente, destinazione, scenario, frazione, seme, workers):
+    """
+    Porta la destinazione nello stato iniziale dello scenario (fuori dalle misure).
+    Nello scenario "modificato" una frazione dei file viene alterata, eliminata o aggiunta
+    nella destinazione, così che la sorgente resti sempre identica tra una ripetizione e l'altra.
+    """
+    if scenario == "iniziale":
+        shutil.rmtree(destinazione, ignore_errors=True)
+        os.makedirs(destinazione)
+        return
+
+    with silenzio():
+        FolderSynchronizer(sorgente, destinazione, workers=workers).sync()
+
+    if scenario == "invariato":
+        return
+
+    rnd = random.Random(seme)
+    files = sorted(os.path.relpath(os.path.join(cartella, nome), destinazione)
+                   for cartella, _, nomi in os.walk(destinazione) for nome in nomi if nome != ".generato")
+
+    for rel_path in rnd.sample(files, int(len(files) * frazione)):
+        percorso = os.path.join(destinazione, rel_path)
+        stat = os.stat(percorso)
+        azione = rnd.random()
+
+        if azione < 0.4:  #Stessa dimensione, contenuto diverso: solo l'hash lo riconosce
+            with open(percorso, "r+b") as f:
+                f.write(b"\xff" * min(stat.st_size, 64))
+
+        elif azione < 0.7:  #Dimensione diversa
+            with open(percorso, "ab") as f:
+                f.write(b"modificato")
+
+        elif azione < 0.9:  #File mancante nella destinazione
+            os.remove(percorso)
+            continue
+
+        else:  #File in più nella destinazione, da eliminare
+            shutil.copyfile(percorso, percorso + ".obsoleto")
+            continue
+
+        #La destinazione risulta più vecchia della sorgente, come dopo una modifica della sorgente
+        os.utime(percorso, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10 ** 10))
+
+
+# ==================== MISURE ======================
+
+@contextlib.contextmanager
+def silenzio():
+    #Il sincronizzatore stampa una riga per file: durante le misure l'output viene scartato
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def cronometra(tempi, fase, funzione, *args):
+    #Esegue una funzione e salva la sua durata in "tempi"
+    inizio = time.perf_counter()
+    with silenzio():
+        risultato = funzione(*args)
+    tempi[fase] = time.perf_counter() - inizio
+    return risultato
+
+
+def esegui_lavori(syncer, lavori):
+    #Esegue copie o eliminazioni con il pianificatore del sincronizzatore, come fa "sync"
+    pianificatore = syncer.crea_pianificatore()
+
+    for dimensione, lavoro in lavori:
+        pianificatore.aggiungi(dimensione, lavoro)
+    pianificatore.chiudi()
+
+    return sum(1 for _, (success, _) in pianificatore if not success)  #Numero di errori
+
+
+def misura(sorgente, destinazione, modalita, workers):
+    """
+    Misura separatamente le fasi di una sincronizzazione.
+
+    Returns:
+        Tupla (tempi, errori) con il dizionario {fase: secondi} (None per le fasi non eseguite)
+    """
+    syncer = FolderSynchronizer(sorgente, destinazione, workers=workers, compare_mode=modalita)
+    tempi = dict.fromkeys(FASI)
+
+    files = cronometra(tempi, "trova_file_da_sincronizzare", syncer.trova_file_da_sincronizzare)
+
+    if modalita == "hash":
+        files = cronometra(tempi, "verifica_con_hash", syncer.verifica_con_hash, files)
+
+    errori = cronometra(tempi, "copia", esegui_lavori, syncer,
+                        [(os.path.getsize(src), ("copia", src, dst)) for src, dst in files])
+
+    da_eliminare = cronometra(tempi, "trova_file_da_eliminare", syncer.trova_file_da_eliminare)
+
+    errori += cronometra(tempi, "eliminazione", esegui_lavori, syncer,
+                         [(0, ("elimina_cartella" if os.path.isdir(dst) else "elimina", dst)) for dst in da_eliminare])
+
+    return tempi, errori + len(syncer.errors)
+
+
+def svuota_cache():
+    #Svuota la page cache del kernel (solo Linux, richiede root), così che le letture arrivino davvero dal disco
+    os.sync()
+    try:
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def commit_corrente():
+    #Commit git corrente, con "+modifiche" se ci sono modifiche non salvate
+    try:
+        cartella = os.path.dirname(os.path.abspath(__file__))
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=cartella, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        modifiche = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=cartella,
+                                   capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ("+modifiche" if modifiche else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "sconosciuto"
+
+
+# ==================== CONFRONTO ======================
+
+def carica_risultati(percorso):
+    #Legge il file JSON Lines dei risultati
+    if not os.path.exists(percorso):
+        return []
+    with open(percorso, encoding="utf-8") as f:
+        return [json.loads(riga) for riga in f if riga.strip()]
+
+
+def confronta(risultati, commit_a=None, commit_b=None):
+    """Stampa, per ogni caso misurato in entrambi i commit, le mediane delle fasi e la variazione percentuale."""
+    commit = list(dict.fromkeys(r["commit"] for r in risultati))  #Commit nell'ordine delle misure
+
+    if commit_a is None:
+        if len(commit) < 2:
+            print("Servono misure di almeno due commit per il confronto")
+            return
+        commit_a, commit_b = commit[-2], commit[-1]
+
+    def casi(commit_scelto):
+        #Ultima misura di ogni caso per il commit scelto (i commit possono essere abbreviati)
+        return {(r["forma"], r["scenario"], r["modalita"], r["workers"]): r
+                for r in risultati if r["commit"].startswith(commit_scelto)}
+
+    casi_a, casi_b = casi(commit_a), casi(commit_b)
+
+    print(f"\nConfronto {commit_a} -> {commit_b} (mediane in secondi)\n")
+    print(f"{'caso':<36} {'fase':<28} {commit_a[:12]:>12} {commit_b[:12]:>12} {'variazione':>10}")
+
+    for caso in sorted(casi_a.keys() & casi_b.keys()):
+        for fase in FASI:
+            a, b = casi_a[caso]["mediana"][fase], casi_b[caso]["mediana"][fase]
+            if a is None or b is None:
+                continue
+            variazione = f"{(b - a) / a * 100:+.1f}%" if a > 0 else ""
+            print(f"{'/'.join(map(str, caso)):<36} {fase:<28} {a:>12.4f} {b:>12.4f} {variazione:>10}")
+
+
+# ==================== MAIN ======================
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark delle fasi di FolderSynchronizer")
+    parser.add_argument("--forme", nargs="+", choices=sorted(FORME), default=sorted(FORME))
+    parser.add_argument("--scenari", nargs="+", choices=SCENARI, default=list(SCENARI))
+    parser.add_argument("--modalita", nargs="+", choices=("mtime", "hash"), default=["mtime", "hash"])
+    parser.add_argument("--workers", nargs="+", type=int, default=[4])
+    parser.add_argument("--scala", type=float, default=1.0, help="Moltiplica numero o dimensione dei file (es. 0.1 per una prova veloce)")
+    parser.add_argument("--frazione-modificati", type=float, default=0.1, help="Frazione di file alterati nello scenario 'modificato'")
+    parser.add_argument("--ripetizioni", type=int, default=3)
+    parser.add_argument("--seme", type=int, default=42)
+    parser.add_argument("--cartella", default=os.path.join("/tmp", "folder_sync_benchmark"),
+                        help="Cartella di lavoro per gli alberi sintetici (su disco locale, non tmpfs, per misure realistiche)")
+    parser.add_argument("--risultati", default="benchmark_results.jsonl", help="File JSON Lines a cui aggiungere i risultati")
+    parser.add_argument("--svuota-cache", action="store_true", help="Svuota la page cache prima di ogni misura (richiede root)")
+    parser.add_argument("--confronta", nargs="*", metavar="COMMIT", help="Confronta due commit (default: gli ultimi due misurati)")
+    args = parser.parse_args()
+
+    if args.confronta is not None:
+        if len(args.confronta) not in (0, 2):
+            parser.error("--confronta accetta zero oppure due commit")
+        confronta(carica_risultati(args.risultati), *args.confronta)
+        return
+
+    commit = commit_corrente()
+    print(f"Commit: {commit}, Python {platform.python_version()}, {os.cpu_count()} CPU")
+
+    for forma in args.forme:
+        sorgente = os.path.join(args.cartella, f"{forma}-{args.scala}", "sorgente")
+        destinazione = os.path.join(args.cartella, f"{forma}-{args.scala}", "destinazione")
+        numero_file, byte_totali = genera_sorgente(sorgente, forma, args.scala, args.seme)
+        print(f"\nForma {forma}: {numero_file} file, {byte_totali / 1024 ** 2:.1f} MB")
+
+        for scenario in args.scenari:
+            for modalita in args.modalita:
+                for workers in args.workers:
+                    ripetizioni = []
+                    errori = 0
+
+                    for ripetizione in range(args.ripetizioni):
+                        prepara_destinazione(sorgente, destinazione, scenario, args.frazione_modificati,
+                                             args.seme + ripetizione, workers)
+                        if args.svuota_cache and not svuota_cache():
+                            print("  Impossibile svuotare la page cache (serve root): misure a cache calda")
+                            args.svuota_cache = False
+
+                        tempi, errori_ripetizione = misura(sorgente, destinazione, modalita, workers)
+                        ripetizioni.append(tempi)
+                        errori += errori_ripetizione
+
+                    mediana = {fase: statistics.median(t[fase] for t in ripetizioni) if ripetizioni[0][fase] is not None else None
+                               for fase in FASI}
+                    minimo = {fase: min(t[fase] for t in ripetizioni) if ripetizioni[0][fase] is not None else None
+                              for fase in FASI}
+
+                    risultato = {
+                        "commit": commit,
+                        "data": datetime.now().isoformat(timespec="seconds"),
+                        "macchina": platform.node(),
+                        "python": platform.python_version(),
+                        "cpu": os.cpu_count(),
+                        "forma": forma,
+                        "scala": args.scala,
+                        "file": numero_file,
+                        "byte": byte_totali,
+                        "scenario": scenario,
+                        "modalita": modalita,
+                        "workers": workers,
+                        "ripetizioni": args.ripetizioni,
+                        "cache_svuotata": args.svuota_cache,
+                        "errori": errori,
+                        "mediana": mediana,
+                        "minimo": minimo,
+                    }
+
+                    with open(args.risultati, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(risultato) + "\n")
+
+                    dettaglio = ", ".join(f"{fase} {secondi:.3f}s" for fase, secondi in mediana.items() if secondi is not None)
+                    print(f"  {scenario}/{modalita}/workers={workers}: {dettaglio}" + (f" ({errori} errori)" if errori else ""))
+
+    print(f"\nRisultati aggiunti a {args.risultati}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,456 +1,3719 @@
-import os                 #Modulo standard pensato per interagire con il sistema operativo (OS)
-import shutil             #Modulo standard pensato per operazioni di "alto livello" con i file
-import hashlib            #Modulo standard che permette l'uso dell'hash per riconoscere con certezza la sincronizzazione dei
-from pathlib import Path    #Importa la classe Path dal modulo pathlib per lavorare con i percorsi limitando errori dovuti ad interpretazioni di Python
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
-#Importa la funzione as_completed che permette di lavorare con i file nell'ordine in cui sono stati processati, e le classi per lavorare
-#con thread e multiprocessing
-from multiprocessing import cpu_count   #Importa la funzione per conoscere il numero di processori a disposizione
-import time               #Modulo standard pensato per lavorare con il tempo
-
-class FolderSynchronizer:
-    """
-    Classe per sincronizzare due cartelle usando threading e multiprocessing.
-    """
-
-    def __init__(self, source, destination, workers=4, use_hash=False):
-        """
-        Inizializza il sincronizzatore.
-
-        Args:
-            source: Percorso cartella sorgente
-            destination: Percorso cartella destinazione
-            workers: Numero di thread/processi paralleli (default: 4)
-            use_hash: Se True, usa hash MD5 per verificare i file (più lento ma più sicuro)
-        """
-        self.source = Path(source)
-        self.destination = Path(destination)
-        self.workers = workers
-        self.use_hash = use_hash
-
-        # Statistiche
-        self.files_copied = 0
-        self.files_deleted = 0
-        self.errors = []
-
-# ==================== CALCOLO HASH ======================
-
-    def calcola_hash(self, filepath):
-        """
-        Metodo che calcola l'hash di un file con algoritmo MD5 (operazione CPU-intensive).
-        Verrà utilizzato con multiprocessing nel metodo "verifica_con_hash".
-
-        Argomenti in ingresso:
-            filepath: Percorso del generico file
-
-        Returns:
-            Tupla (filepath, hash_string, success)
-        """
-        try:
-            hash_md5 = hashlib.md5()  #Elemento per processare dati e calcolare hash tramite "hashlib" con agoritmo MD5
-            chunk_size = 1024 * 1024  #Ogni pezzo di file processato sarà di 1MB
-
-            #Il file verrà aperto e letto a pezzi per non occupare troppa RAM durante la lettura
-            with open(filepath, "rb") as f:  #Apertura e successiva chiusura del file con lettura in modalità binaria per calcolo hash
-
-                while True:
-                    chunk = f.read(chunk_size)  #Lettura pezzo di file di dimensione "chunk_size" = 1 MB
-                    if not chunk:
-                        break  #Il ciclo while si chiude quando l'elemento chunk è vuoto
-
-                    hash_md5.update(chunk)  #Aggiorna gradualmente l'hash del file man mano che si aggiungono i chunk
-
-            return filepath, hash_md5.hexdigest(), True  #Restituisce il percorso del file e l'hash in formato esadecimale più il boolean True in "success"
-
-        except Exception as e:
-            return filepath, None, False  #Restituisce la tupla con il percorso, senza l'hash ed il boolean False in "success"
-
-# ==================== COPIA FILE ======================
-
-    def copia_file(self, src_file, dst_file):
-        """
-        Metodo che copia un singolo file (operazione I/O-intensive).
-        Verrà utilizzato con threading nel metodo "sync" alla fase 2.
-
-        Argomenti in ingresso:
-            src_file: Percorso file sorgente
-            dst_file: Percorso file destinazione
-
-        Returns:
-            Tupla (success, message)
-        """
-
-        #Estrazione della (sotto)cartella che contiene il file dal percorso completo
-        dst_folder = os.path.dirname(dst_file)
-
-        try:
-            #Verifica l'esistenza della cartella nella destinazione e la crea se non esiste
-            if not os.path.exists(dst_folder):
-                os.makedirs(dst_folder)
-
-            #Copia il file con metadati
-            shutil.copy2(src_file, dst_file)
-
-            return True, f"\nCopiato: {Path(src_file).name}"  #Restituisce un True ed un messaggio di operazione andata a buon fine
-
-        except Exception as e:
-            return False, f"\nErrore copiando {Path(src_file).name}: {str(e)}"  #Restituisce un False e relativo messaggio
-
-# ==================== ELIMINA FILE ======================
-
-    def elimina_file(self, file_path):
-        """
-        Metodo che elimina un singolo file.
-        Verrà utilizzato con threading nel metodo "sync" alla fase 3.
-
-        Argomenti in ingresso:
-            file_path: Percorso del file da eliminare
-
-        Returns:
-            Tupla (success, message)
-        """
-        try:  #Elimina file e restituisce il True in "success" con relativo messaggio
-            os.remove(file_path)
-            return True, f"\nEliminato: {Path(file_path).name}"
-
-        except Exception as e:  #In caso di eccezione restituisce il False in "success" con relativo messaggio
-
-            return False, f"\nErrore eliminando {Path(file_path).name}: {str(e)}"
-
-# ==================== TROVA FILE ======================
-
-    def trova_file_da_sincronizzare(self):
-        """
-        Metodo che scansiona le cartelle e identifica quali file devono essere copiati.
-        Viene utilizzato nel metodo "sync" alla fase 1.
-
-        Returns:
-            Lista di tuple (src_file, dst_file) dei file da copiare
-        """
-        files_da_copiare = []  #Inizializza la lista da riempire con le tuple
-
-        print("\nScansione cartelle in corso...")
-
-        """
-        Nel ciclo for successivo:
-        walk() dalla libreria os percorre una cartella restituendo la seguente tupla: (root, dirs, files)
-        "root" contiene il percorso completo della cartella
-        "dirs" contiene una lista con i nomi delle sottocartelle in root
-        "files" contiene una lista con i nomi dei file in root
-        I nomi sono convenzionali di Python
-        Il seguente ciclo funziona quindi con una tupla relativa alla cartella source e quelle relative alle sottocartelle
-        Ciascuna tupla contiene il percorso della cartella, la lista con le sottocartelle in essa contenute e la lista con i
-        file in essa contenuti
-        """
-
-        for root, dirs, files in os.walk(self.source):
-
-            #"rel_path" è il percorso relativo di "root" rispetto a "source",
-            #in altre parole, ciò che manca al percorso "source" per diventare "root"
-            rel_path = os.path.relpath(root, self.source)
-
-            #"dst_path" è il percorso della cartella "destination" o contenuta in "destination" analogo a "root"
-            #La "join()" serve per aggiungere il 'pezzo di percorso' "rel_path" al percorso "destination"
-            dst_path = os.path.join(self.destination, rel_path)
-
-            #La riga seguente verifica che la cartella del percorso "dst_path" esista, prima di procedere
-            os.makedirs(dst_path, exist_ok=True)
-
-            """
-            Il seguente ciclo scorre la lista "files" presente nella tupla e definisce 2 elementi per ogni file
-            Uno contiene il percorso completo del file nella cartella lato sorgente
-            L'altro contiene il percorso completo dello stesso file nella cartella lato destinazione
-            """
-
-            for file in files:
-                src_file = os.path.join(root, file)  #join che crea il percorso completo del file a partire dalla root
-                dst_file = os.path.join(dst_path, file)  #join per il file analogo nella cartella di destinazione
-
-                #Verifica se il file deve essere copiato verificando prima l'esistenza
-                if not os.path.exists(dst_file):
-
-                    #File non esiste nella destinazione
-                    files_da_copiare.append((src_file, dst_file))
-
-                elif not self.use_hash:  #Se "use_hash" è False, si fa una verifica della datà come modalità di controllo rapido senza hash
-
-                    #Controllo semplice: data di modifica
-                    if os.path.getmtime(src_file) > os.path.getmtime(dst_file):
-                        files_da_copiare.append((src_file, dst_file))
-
-                """
-                Il controllo con getmtime() sarà l'unico eseguito, per maggiore rapidità, in caso si decida di
-                non ricorrere all'uso dell'hash.
-                """
-
-        return files_da_copiare  #Restituisce la lista di tuple relative ai file da copiare
-
-# ==================== VERIFICA HASH ======================
-
-    def verifica_con_hash(self, files_da_verificare):
-        """
-        Metodo che verifica l'uguaglianza dei file usando hash MD5 (usa multiprocessing).
-        Viene utilizzato nel metodo "sync" alla fase 1.
-
-        Args:
-            files_da_verificare: Lista di tuple (src_file, dst_file)
-
-        Returns:
-            Lista di tuple (src_file, dst_file) dei file che sono diversi
-        """
-        if not files_da_verificare:  #Se non ci sono file da verificare, restituisce una lista vuota in uscita
-            return []
-
-        print(f"\nCalcolo hash per {len(files_da_verificare)} file...")
-
-        #Prepara lista di tutti i file da hashare
-        files_to_hash = []  #Inizializza lista di file di cui calcolare l'hash
-
-        for src, dst in files_da_verificare:  # Aggiunge alla lista tutti i file da sorgente e destinazione
-            files_to_hash.append(src)
-            files_to_hash.append(dst)
-
-        #Inizializza il dizionario dove inserire i valori hash con i percorsi dei file come chiave
-        hashes = {}
-
-        #Calcola hash in parallelo usando tutti i core CPU
-        with ProcessPoolExecutor(max_workers=cpu_count()) as executor:  #La classe ProcessPoolExecutor utilizza il numero massimo di processori a disposizione
-
-            #Nel dizionario seguente vengono inseriti i future degli hash come chiavi e i percorsi dei file come chiavi
-            future_to_file = {
-                executor.submit(self.calcola_hash, f): f    #Invia il task il calcolo dell'hash al ProcessPoolExecutor con il metodo submit()
-                                                            #Questo crea una chiave "future", cioè l'oggetto che conterrà l'hash alla fine della task
-                for f in files_to_hash                      #Per ogni file, inserito come relativo valore nel dizionario
-            }
-
-            completati = 0  #Inizializza il numero di file completati
-
-            for future in as_completed(future_to_file):  #Assegna a "future" i valori di "future_to_file" in ordine di processing (as_completed())
-
-                filepath, hash_value, success = future.result()   #Da ogni "future" viene estratta una tupla con 3 valori che vengono assegnati ai rispettivi items
-                                                                  #Il metodo result() aspetta la fine della task chiamata col metodo submit()
-                completati += 1
-
-                if success:  #Verifica che la variabile "success" sia True
-                    hashes[filepath] = hash_value  #Salva l'hash come valore nel dizionario "hashes" usando il filepath come chiave
-
-                    if completati % 10 == 0:  #Mostra progresso ogni 10 file
-                        print(f"\nHash calcolati: {completati}/{len(files_to_hash)}")
-                else:
-                    print(f"\nErrore calcolando hash per {Path(filepath).name}")
-
-        #Confronto degli hash
-        files_diversi = []  #Inizializza la lista di quei file tali che quello in destinazione è diverso dal relativo file nella sorgente
-
-        for src, dst in files_da_verificare:      #Prende la lista in ingresso al metodo per un check sui percorsi
-            if src in hashes and dst in hashes:   #Se "hashes" contiene sia il file di sorgente che il relativo di destinazione
-                if hashes[src] != hashes[dst]:    #Se i loro valori di hash sono diversi
-                    files_diversi.append((src, dst))  # La lista viene aggiornata con i file in questione
-            else:
-                files_diversi.append((src, dst))  #Se non siamo riusciti a calcolare l'hash, aggiungiamo ugualmente il percorso del file alla lista
-
-        print(f"\n{len(files_diversi)} file necessitano aggiornamento")
-
-        return files_diversi  #Restituisce in uscita la lista creata
-
-# ==================== FILE DA ELIMINARE ======================
-
-    def trova_file_da_eliminare(self):
-        """
-        Metodo che trova i file nella destinazione che non esistono nella sorgente.
-        Viene utilizzato nel metodo "sync" alla fase 3.
-
-        Returns:
-            Lista di percorsi dei file da eliminare
-        """
-        files_da_eliminare = []  # Inizializza la lista da riempire con i percorsi dei file da eliminare
-
-        """
-        Nel ciclo for successivo:
-        walk() dalla libreria os percorre una cartella restituendo la seguente tupla: (root, dirs, files)
-        "root" contiene il percorso completo della cartella
-        "dirs" contiene una lista con i nomi delle sottocartelle in root
-        "files" contiene una lista con i nomi dei file in root
-        I nomi sono convenzionali di Python
-        Il seguente ciclo funziona quindi con una tupla relativa alla cartella destination e quelle relative alle sottocartelle
-        Ciascuna tupla contiene il percorso della cartella, la lista con le sottocartelle in essa contenute e la lista con i
-        file in essa contenuti
-        """
-
-        for root, dirs, files in os.walk(self.destination):
-
-            #"rel_path" è il percorso relativo di "root" rispetto a "source",
-            #in altre parole, ciò che manca al percorso "source" per diventare "root"
-            rel_path = os.path.relpath(root, self.destination)
-
-            #"dst_path" è il percorso della cartella "destination" o contenuta in "destination" analogo a "root"
-            #La "join()" serve per aggiungere il 'pezzo di percorso' "rel_path" al percorso "destination"
-            src_path = os.path.join(self.source, rel_path)
-
-            """
-            Il seguente ciclo scorre la lista "files" presente nella tupla e definisce 2 elementi per ogni file
-            Uno contiene il percorso completo del file nella cartella lato sorgente
-            L'altro contiene il percorso completo dello stesso file nella cartella lato destinazione
-            """
-
-            for file in files:
-                dst_file = os.path.join(root, file)  #join che crea il percorso completo del file a partire dalla root
-                src_file = os.path.join(src_path, file)  #join per il file analogo nella cartella di destinazione
-
-                if not os.path.exists(src_file):         #Verifica lato sorgente l'esistenza del percorso del file da eliminare
-                    files_da_eliminare.append(dst_file)  #Aggiunge il file lato destinazione nella lista dei file da eliminare
-
-        return files_da_eliminare
-
-# ==================== SINCRONIZZATORE ======================
-
-    def sync(self):
-        """
-        Metodo che esegue la sincronizzazione completa.
-        Viene utilizzato nel "main".
-        """
-        start_time = time.time()  #Salva il momento di inizio sincronizzazione
-
-        print("=" * 60)
-        print("INIZIO SINCRONIZZAZIONE")
-        print("=" * 60)
-        print(f"Sorgente: {self.source}")
-        print(f"Destinazione: {self.destination}")
-        print(f"Workers: {self.workers}")
-        print(f"Verifica hash: {'Sì' if self.use_hash else 'No'}")
-        print("=" * 60)
-
-        #FASE 1: Trova i file da sincronizzare
-        files_da_copiare = self.trova_file_da_sincronizzare()
-
-        #Se usa hash, verifica quali sono effettivamente diversi
-        if self.use_hash and files_da_copiare:
-
-            #Filtra solo i file che esistono già (per verificarli con hash)
-
-            files_esistenti = [(s, d) for s, d in files_da_copiare
-                               if os.path.exists(d)]  #Il file viene aggiunto nella lista di file esistenti se esiste nella destinazione
-
-            files_nuovi = [(s, d) for s, d in files_da_copiare
-                           if not os.path.exists(d)]  #Il file viene aggiunto nella lista di file da aggiungere se non esiste nella destinazione
-
-            if files_esistenti:  # Se la lista contiene elementi
-                files_modificati = self.verifica_con_hash(files_esistenti)  # Si fa la verifica di uguaglianza tramite l'hash dei file esistenti
-                files_da_copiare = files_nuovi + files_modificati  # Si aggiungono i file nuovi
-
-            else:
-                files_da_copiare = files_nuovi  # Altrimenti ci sono solo file nuovi da aggiungere
-
-        #FASE 2: Copia file in parallelo - Threading
-        if files_da_copiare:  #Se ci sono file da copiare
-
-            print(f"\nCopiando {len(files_da_copiare)} file...")
-
-            with ThreadPoolExecutor(max_workers=self.workers) as executor:  #I file vengono processati tramite thread
-
-                future_to_file = {
-                    executor.submit(self.copia_file, src, dst): (src, dst)  #Anche qua, il metodo submit() manda la task al ThreadPoolExecutor creando una chiave "future"
-                    for src, dst in files_da_copiare                        #Per ogni file da copiare, inserito come relativo valore nel dizionario
-                }
-
-                for future in as_completed(future_to_file):  #Ciclo che conta i processi completati e gli errori prendendo i future man mano che vengono completati
-
-                    success, message = future.result()  #Il metodo result() prende il risultato del future come tupla composta da un tipo boolean ed un messaggio
-                                                        #Il messaggio è utile in caso di errore, il quale viene indicato e può essere stampato
-
-                    if success:  #Se la variabile "success" è True, aggiorna il numero di file copiati
-                        self.files_copied += 1  #Aggiorna il contatore dei file copiati, inizializzato nella definizione della classe FolderSynchronizer
-                        print(f"  {message}")
-                    else:
-                        self.errors.append(message)   #Altrimenti aggiunge il messaggio di errore alla lista "errors" e lo stampa
-                        print(f"  {message}")
-
-            print(f"\nCopiati {self.files_copied} file")  #Stampa l'informazione con il numero di files copiati
-
-        else:
-            print("\nNessun file da copiare")  # Se non ci sono file da copiare
-
-        #FASE 3: Elimina file superflui
-        files_da_eliminare = self.trova_file_da_eliminare()
-
-        if files_da_eliminare:  #Se ci sono file da eliminare
-
-            print(f"\nEliminando {len(files_da_eliminare)} file superflui...")
-
-            with ThreadPoolExecutor(max_workers=self.workers) as executor:  #File processati con thread
-
-                future_to_file = {
-                    executor.submit(self.elimina_file, f): f  #Dizionario contenente i future ed i percorsi dei file da eliminare
-                    for f in files_da_eliminare
-                }
-
-                for future in as_completed(future_to_file):  #Ciclo che conta i processi completati e gli errori
-                    success, message = future.result()
-
-                    if success: #Se la variabile "success" è True, aggiorna il numero di file cancellati
-                        self.files_deleted += 1   #Aggiorna il contatore dei file eliminati, inizializzato nella definizione della classe FolderSynchronizer
-                        print(f"  {message}")
-                    else:
-                        self.errors.append(message)   #Altrimenti aggiunge il messaggio di errore alla lista "errors" e lo stampa
-                        print(f"  {message}")
-
-            print(f"\nEliminati {self.files_deleted} file") #Stampa l'informazione con il numero di files eliminati
-
-        else:
-            print("\nNessun file da eliminare")  #Se non ci sono file da eliminare
-
-        #RIEPILOGO
-
-        elapsed_time = time.time() - start_time  #Tempo trascorso come momento attuale meno momento iniziale
-
-        print("\n" + "=" * 60)
-        print("RIEPILOGO SINCRONIZZAZIONE")
-        print("=" * 60)
-        print(f"File copiati: {self.files_copied}")
-        print(f"File eliminati: {self.files_deleted}")
-        print(f"Errori: {len(self.errors)}")
-        print(f"Tempo impiegato: {elapsed_time:.2f} secondi")
-        print("=" * 60)
-
-        if self.errors:  #Se ci sono stati errori
-
-            print("\nERRORI RISCONTRATI:")
-            for error in self.errors:
-                print(f"  {error}")  #Stampa tutti gli errori riscontrati
-
-        print("\nSincronizzazione completata!")
-
-
-# ==================== MAIN ======================
-
-if __name__ == "__main__":
-
-    #Inserire i percorsi delle cartelle
-    source_folder = Path(r"Sorgente")
-    destination_folder = Path(r"Destinazione")
-
-    #Si spiega la possibilità di scegliere se usare l'hash oppure no
-    print("\nScegli modalità di sincronizzazione:")
-    print("1. Veloce (controllo data/dimensione)")
-    print("2. Sicura (verifica hash MD5)")
-
-    scelta = input("\nInserisci 1 o 2: ").strip()
-
-    use_hash = (scelta == "2")    #Se la scelta è uguale a 2 (True) verrà utilizzato il calcolo dell'hash
-
-    #Crea il sincronizzatore
-    syncer = FolderSynchronizer(
-        source=source_folder,
-        destination=destination_folder,
-        workers=4,  # Usa 4 thread/processi paralleli
-        use_hash=use_hash
-    )
-
-    #Esegui la sincronizzazione
-    syncer.sync()
-
-
-    #Si può automatizzare senza input utente usando direttamente le righe sotto
-
-    #syncer = FolderSynchronizer(source_folder, destination_folder, workers=4, use_hash=False)
+import os                 #Modulo standard pensato per interagire con il sistema operativo (OS)
+import errno              #Modulo standard con i codici di errore del sistema operativo
+import shutil             #Modulo standard pensato per operazioni di "alto livello" con i file
+import hashlib            #Modulo standard che permette l'uso dell'hash per riconoscere con certezza la sincronizzazione dei
+from pathlib import Path    #Importa la classe Path dal modulo pathlib per lavorare con i percorsi limitando errori dovuti ad interpretazioni di Python
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+#Importa la funzione as_completed che permette di lavorare con i file nell'ordine in cui sono stati processati, e le classi per lavorare
+#con thread e multiprocessing
+from concurrent.futures import wait, FIRST_COMPLETED   #Permette di attendere il primo di un gruppo di future completati
+from multiprocessing import cpu_count   #Importa la funzione per conoscere il numero di processori a disposizione
+from collections import Counter, deque, namedtuple   #Contatore, coda efficiente e tuple con campi nominati
+from functools import partial   #Permette di fissare i parametri delle funzioni inviate ai worker
+from itertools import chain, count     #Concatenazione di iterabili senza costruire liste e contatore crescente
+import sqlite3            #Modulo standard per database SQLite, usato per il manifest della destinazione
+import heapq              #Modulo standard per code con priorità (usato dal pianificatore delle copie)
+import queue              #Modulo standard per code sicure tra thread
+import threading          #Modulo standard per sincronizzare l'accesso concorrente dei thread (Lock)
+import time               #Modulo standard pensato per lavorare con il tempo
+import select             #Modulo standard per attendere dati da un descrittore di file (usato con inotify)
+import struct             #Modulo standard per decodificare strutture binarie (gli eventi di inotify)
+import ctypes             #Modulo standard per chiamare le funzioni della libreria C (inotify)
+import ctypes.util
+import asyncio            #Modulo standard per la programmazione asincrona (usato da "sync_async")
+import json               #Modulo standard per scrivere il rapporto delle metriche in formato JSON
+import re                 #Modulo standard per le espressioni regolari (riconosce i nomi dei file temporanei)
+
+#Librerie opzionali per algoritmi di hash più veloci (pip install xxhash / pip install blake3)
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+#Modulo disponibile solo sui sistemi Unix, usato per il clone (reflink) dei file
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+#Libreria C usata per inotify (solo Linux); altrimenti la modalità "watch" ricorre al polling
+try:
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    libc.inotify_init1
+except (OSError, AttributeError):
+    libc = None
+
+#Singola azione del piano di sincronizzazione prodotto dal motore di confronto (vedi "calcola_piano")
+#"tipo" può essere "copia", "aggiorna", "verifica", "elimina" oppure "elimina_cartella" (intero sottoalbero)
+#"src_stat" e "dst_stat" contengono i risultati di stat() già ottenuti durante la scansione (None se non disponibili)
+Azione = namedtuple("Azione", ["tipo", "src", "dst", "src_stat", "dst_stat"])
+
+#Algoritmi forniti dalle librerie opzionali, oltre a quelli di hashlib (md5, sha1, blake2b, blake2s, sha256, ...)
+ALGORITMI_XXHASH = ("xxh32", "xxh64", "xxh3_64", "xxh3_128", "xxh128")
+ALGORITMI_BLAKE3 = ("blake3",)
+
+
+def crea_hash(algoritmo):
+    """
+    Funzione che crea un nuovo oggetto hash per l'algoritmo richiesto.
+    È una funzione di modulo per poter essere usata anche dai processi del ProcessPoolExecutor.
+
+    Argomenti in ingresso:
+        algoritmo: Nome dell'algoritmo (di hashlib, di xxhash oppure "blake3")
+
+    Returns:
+        Oggetto con i metodi update() e hexdigest()
+    """
+    if algoritmo in ALGORITMI_XXHASH:
+        if xxhash is None:
+            raise ValueError(f"L'algoritmo {algoritmo} richiede il pacchetto 'xxhash' (pip install xxhash)")
+        return getattr(xxhash, algoritmo)()
+
+    if algoritmo in ALGORITMI_BLAKE3:
+        if blake3 is None:
+            raise ValueError(f"L'algoritmo {algoritmo} richiede il pacchetto 'blake3' (pip install blake3)")
+        return blake3.blake3()
+
+    return hashlib.new(algoritmo)  #Solleva ValueError se l'algoritmo non è supportato da hashlib
+
+# ==================== MOTORE DI COPIA ======================
+
+#Richiesta ioctl di Linux che clona un file condividendone i blocchi (reflink: btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+#Chiamate che non supportano la coppia di file (filesystem diversi o non compatibili): si prova la strategia successiva
+ERRNO_NON_SUPPORTATO = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTTY,
+                        errno.EBADF, errno.EPERM}
+
+
+def copia_contenuto(src_file, dst_file, buffer_size=8 * 1024 ** 2, usa_reflink=True, limitatore=None):
+    """
+    Funzione che copia il contenuto di un file provando, in ordine, la strategia più efficiente disponibile:
+    reflink (FICLONE), os.copy_file_range, os.sendfile ed infine una copia con buffer di "buffer_size" byte.
+    Le prime tre non fanno passare i dati dallo spazio utente; il reflink non copia nemmeno i blocchi.
+    I metadati non vengono copiati (vedi shutil.copystat).
+
+    Argomenti in ingresso:
+        src_file: Percorso file sorgente
+        dst_file: Percorso file destinazione (viene creato o sovrascritto)
+        buffer_size: Dimensione del buffer della copia in spazio utente (default: 8 MB)
+        usa_reflink: False per ottenere sempre una copia fisica dei blocchi
+        limitatore: Funzione chiamata con il numero di byte di ogni blocco copiato, che attende se
+                    la banda disponibile è esaurita (None: nessun limite); il reflink non trasferisce dati
+
+    Returns:
+        Nome della strategia usata: "reflink", "copy_file_range", "sendfile" oppure "buffer"
+    """
+    if limitatore is not None:  #Blocchi più piccoli rendono la banda limitata più regolare
+        buffer_size = min(buffer_size, 1024 ** 2)
+
+    with open(src_file, "rb") as fs, open(dst_file, "wb") as fd:
+        fd_src = fs.fileno()
+        fd_dst = fd.fileno()
+
+        if usa_reflink and fcntl is not None:
+            try:
+                fcntl.ioctl(fd_dst, FICLONE, fd_src)
+                return "reflink"
+            except OSError as e:
+                if e.errno not in ERRNO_NON_SUPPORTATO:
+                    raise
+
+        #copy_file_range e sendfile lavorano a blocchi fino alla fine del file; se falliscono già
+        #sul primo blocco la coppia di file non è supportata e si passa alla strategia successiva
+        for strategia in ("copy_file_range", "sendfile"):
+            if not hasattr(os, strategia):
+                continue
+
+            copiati = 0
+            try:
+                while True:
+                    if strategia == "copy_file_range":
+                        n = os.copy_file_range(fd_src, fd_dst, buffer_size, copiati, copiati)
+                    else:
+                        n = os.sendfile(fd_dst, fd_src, copiati, buffer_size)
+
+                    if n == 0:
+                        if copiati == 0 and os.fstat(fd_src).st_size > 0:
+                            break  #Nessun byte da un file non vuoto (alcuni FUSE/overlay): si prova la strategia successiva
+                        return strategia
+                    copiati += n
+
+                    if limitatore is not None:
+                        limitatore(n)
+
+            except OSError as e:
+                if copiati or e.errno not in ERRNO_NON_SUPPORTATO:
+                    raise
+
+        #Copia in spazio utente con un unico buffer riutilizzato
+        buffer = bytearray(buffer_size)
+        vista = memoryview(buffer)
+        while True:
+            letti = fs.readinto(buffer)
+            if not letti:
+                return "buffer"
+            fd.write(vista[:letti])
+
+            if limitatore is not None:
+                limitatore(letti)
+
+
+def copia_su_piu_destinazioni(src_file, dst_files, buffer_size=8 * 1024 ** 2, algoritmo=None, limitatore=None):
+    """
+    Funzione che legge un file una sola volta e ne scrive il contenuto in più destinazioni,
+    calcolandone opzionalmente l'hash nella stessa passata. Un errore su una destinazione
+    non interrompe la scrittura delle altre. I metadati non vengono copiati (vedi shutil.copystat).
+
+    Argomenti in ingresso:
+        src_file: Percorso file sorgente
+        dst_files: Lista dei percorsi di destinazione (vengono creati o sovrascritti)
+        buffer_size: Dimensione del buffer di lettura (default: 8 MB)
+        algoritmo: Algoritmo dell'hash da calcolare durante la lettura (None: nessun hash)
+        limitatore: Funzione chiamata con i byte di ogni blocco letto, come in "copia_contenuto" (None: nessun limite)
+
+    Returns:
+        Tupla (hash, errori) con l'hash esadecimale del contenuto (None se non richiesto)
+        e la lista, parallela a "dst_files", delle eccezioni di ogni destinazione (None se riuscita)
+    """
+    hasher = crea_hash(algoritmo) if algoritmo is not None else None
+    errori = [None] * len(dst_files)
+    uscite = []
+
+    for indice, dst_file in enumerate(dst_files):
+        try:
+            uscite.append(open(dst_file, "wb"))
+        except OSError as e:
+            errori[indice] = e
+            uscite.append(None)
+
+    try:
+        with open(src_file, "rb") as fs:
+            buffer = bytearray(buffer_size)
+            vista = memoryview(buffer)
+
+            while any(uscita is not None for uscita in uscite):
+                letti = fs.readinto(buffer)
+                if not letti:
+                    break
+
+                if hasher is not None:
+                    hasher.update(vista[:letti])
+
+                if limitatore is not None:
+                    limitatore(letti)
+
+                for indice, uscita in enumerate(uscite):
+                    if uscita is None:
+                        continue
+                    try:
+                        uscita.write(vista[:letti])
+                    except OSError as e:  #Ad esempio disco pieno: la destinazione viene abbandonata
+                        errori[indice] = e
+                        uscita.close()
+                        uscite[indice] = None
+
+    finally:
+        for indice, uscita in enumerate(uscite):
+            if uscita is not None:
+                try:
+                    uscita.close()
+                except OSError as e:
+                    errori[indice] = e
+
+    return (hasher.hexdigest() if hasher is not None else None), errori
+
+# ==================== FUNZIONI DEI WORKER ======================
+#Funzioni di modulo eseguite dai worker della pipeline di confronto: ai processi viene inviato solo il loro
+#nome con pochi parametri, invece dell'intero FolderSynchronizer come accadeva con il metodo "calcola_hash"
+
+#Coppia di file da confrontare; "hash_src" e "hash_dst" sono i valori già noti (da cache o manifest) oppure None
+CoppiaHash = namedtuple("CoppiaHash", ["src", "dst", "stat_src", "stat_dst", "hash_src", "hash_dst"])
+
+
+def hash_file(filepath, algoritmo="md5", chunk_size=1024 * 1024):
+    """
+    Funzione che calcola l'hash dell'intero contenuto di un file, leggendolo a pezzi di "chunk_size" byte
+    in un unico buffer riutilizzato. hashlib rilascia il GIL sui buffer grandi, quindi può girare anche su thread.
+
+    Argomenti in ingresso:
+        filepath: Percorso del file
+        algoritmo: Algoritmo di hash (vedi "crea_hash")
+        chunk_size: Dimensione dei pezzi letti (default: 1 MB)
+
+    Returns:
+        Hash in formato esadecimale
+    """
+    hash_value = crea_hash(algoritmo)
+    buffer = bytearray(chunk_size)
+    vista = memoryview(buffer)
+
+    with open(filepath, "rb", buffering=0) as f:
+        while True:
+            letti = f.readinto(buffer)
+            if not letti:
+                break
+            hash_value.update(vista[:letti])
+
+    return hash_value.hexdigest()
+
+
+def impronta_file(filepath, algoritmo="md5", blocchi=8, dimensione_blocco=64 * 1024):
+    """
+    Funzione che calcola un'impronta a campione di un file: dimensione, primo ed ultimo blocco
+    e "blocchi" blocchi equidistanti. I file piccoli vengono letti per intero.
+
+    Argomenti in ingresso:
+        filepath: Percorso del file
+        algoritmo: Algoritmo di hash (vedi "crea_hash")
+        blocchi: Numero di blocchi equidistanti, oltre ad inizio e fine
+        dimensione_blocco: Dimensione in byte di ogni blocco
+
+    Returns:
+        Impronta in formato esadecimale
+    """
+    impronta = crea_hash(algoritmo)
+
+    with open(filepath, "rb") as f:
+        dimensione = os.fstat(f.fileno()).st_size
+        impronta.update(str(dimensione).encode())  #La dimensione fa parte dell'impronta
+
+        if dimensione <= dimensione_blocco * (blocchi + 2):
+            posizioni = range(0, dimensione, dimensione_blocco)  #File piccolo: viene letto tutto
+        else:
+            #Inizio, fine e blocchi equidistanti nella parte centrale
+            passo = (dimensione - dimensione_blocco) // (blocchi + 1)
+            posizioni = [passo * i for i in range(blocchi + 1)] + [dimensione - dimensione_blocco]
+
+        for posizione in posizioni:
+            f.seek(posizione)
+            impronta.update(f.read(dimensione_blocco))
+
+    return impronta.hexdigest()
+
+
+def elabora_lotto(lotto, funzione):
+    """
+    Funzione eseguita da un worker della pipeline: calcola con "funzione" i valori mancanti
+    (hash o impronta) di tutte le coppie di un lotto.
+
+    Argomenti in ingresso:
+        lotto: Lista di CoppiaHash
+        funzione: Funzione che riceve un percorso e restituisce il valore del file
+
+    Returns:
+        Tupla (inizio, fine, risultati): istanti di inizio e fine del lavoro (time.monotonic(), per le metriche)
+        e lista di tuple (coppia, valore_src, valore_dst), con None per i valori non calcolabili
+    """
+    inizio = time.monotonic()
+    risultati = []
+
+    for coppia in lotto:
+        valori = []
+
+        for percorso, valore in ((coppia.src, coppia.hash_src), (coppia.dst, coppia.hash_dst)):
+            if valore is None:
+                try:
+                    valore = funzione(percorso)
+                except Exception:
+                    valore = None  #Il file non è leggibile: la coppia verrà considerata diversa
+            valori.append(valore)
+
+        risultati.append((coppia, valori[0], valori[1]))
+
+    return inizio, time.monotonic(), risultati
+
+
+#Cartella riservata, nella radice della destinazione, che contiene i dati del sincronizzatore (manifest, ecc.)
+#Viene ignorata dalla scansione su entrambi i lati
+CARTELLA_METADATI = ".folder_sync"
+
+#Suffisso dei file temporanei in cui vengono scritte le copie, rinominati sul file finale solo a copia completata
+SUFFISSO_TEMPORANEO = ".fstmp"
+
+#Nome completo dei file temporanei: ".<nome>.<id dell'esecuzione, 8 cifre esadecimali>-<numero della copia>.fstmp"
+MODELLO_TEMPORANEO = re.compile(r"\..+\.([0-9a-f]{8})-[0-9a-f]+" + re.escape(SUFFISSO_TEMPORANEO) + r"\Z", re.DOTALL)
+
+#Lunghezza massima in byte di un nome di file (NAME_MAX sui filesystem Linux più diffusi)
+LUNGHEZZA_MAX_NOME = 255
+
+#Voce del manifest: espone gli stessi campi di stat() usati dal motore di confronto, più l'hash del contenuto (se noto)
+VoceManifest = namedtuple("VoceManifest", ["st_size", "st_mtime_ns", "st_ino", "hash"])
+
+# ==================== METRICHE ======================
+
+class Metriche:
+    """
+    Classe che raccoglie le metriche di una sincronizzazione: tempo, file e byte di ogni fase
+    (scansione, hash, impronta, copia, eliminazione), numero di chiamate al filesystem
+    e tempo di attesa di ogni worker del pianificatore, attese dovute ai limiti di banda ed operazioni
+    e concorrenza scelta dall'autoregolazione. Può essere usata da più thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.inizio = time.monotonic()
+        self.fasi = {}  #Fase -> dizionario con secondi di lavoro cumulati, file, byte, primo inizio ed ultima fine
+        self.chiamate = Counter()  #Chiamata al filesystem -> numero di chiamate
+        self.attese = Counter()  #Nome del worker -> secondi trascorsi in attesa di un lavoro
+        self.limitazioni = Counter()  #Risorsa limitata ("byte", "operazioni") -> secondi di attesa cumulati dei worker
+        self.concorrenza = {}  #Corsia -> dizionario con thread attuali, minimi, massimi e numero di regolazioni
+
+    def registra(self, fase, inizio, file=1, byte=0, fine=None):
+        """
+        Registra un'operazione terminata.
+
+        Args:
+            fase: Nome della fase ("scansione", "hash", "impronta", "copia", "eliminazione")
+            inizio: Momento di inizio dell'operazione (time.monotonic())
+            file: Numero di file elaborati
+            byte: Numero di byte letti o scritti
+            fine: Momento di fine dell'operazione (default: adesso)
+        """
+        if fine is None:
+            fine = time.monotonic()
+
+        with self.lock:
+            voce = self.fasi.get(fase)
+            if voce is None:
+                voce = self.fasi[fase] = {"secondi": 0.0, "file": 0, "byte": 0, "inizio": inizio, "fine": fine}
+
+            voce["secondi"] += fine - inizio
+            voce["file"] += file
+            voce["byte"] += byte
+            voce["inizio"] = min(voce["inizio"], inizio)
+            voce["fine"] = max(voce["fine"], fine)
+
+    def conta(self, chiamata, numero=1):
+        """Aggiunge "numero" chiamate al filesystem del tipo indicato (es. "stat", "scandir", "unlink")."""
+        with self.lock:
+            self.chiamate[chiamata] += numero
+
+    def attesa(self, worker, secondi):
+        """Aggiunge il tempo trascorso da un worker in attesa di un lavoro."""
+        with self.lock:
+            self.attese[worker] += secondi
+
+    def limitazione(self, risorsa, secondi):
+        """Aggiunge il tempo atteso da un worker per rispettare il limite di "risorsa" ("byte" oppure "operazioni")."""
+        with self.lock:
+            self.limitazioni[risorsa] += secondi
+
+    def regolazione(self, corsia, thread):
+        """Registra la concorrenza di una corsia del pianificatore scelta dall'autoregolazione."""
+        with self.lock:
+            voce = self.concorrenza.get(corsia)
+            if voce is None:
+                voce = self.concorrenza[corsia] = {"attuale": thread, "minima": thread, "massima": thread, "regolazioni": 0}
+
+            if thread != voce["attuale"]:
+                voce["regolazioni"] += 1
+            voce["attuale"] = thread
+            voce["minima"] = min(voce["minima"], thread)
+            voce["massima"] = max(voce["massima"], thread)
+
+    def totali(self, fase):
+        """Restituisce la tupla (file, byte) registrati per una fase."""
+        with self.lock:
+            voce = self.fasi.get(fase, {})
+            return voce.get("file", 0), voce.get("byte", 0)
+
+    def rapporto(self):
+        """
+        Restituisce le metriche come dizionario, pronto per json.dumps.
+        Per ogni fase "durata" è il tempo reale dalla prima all'ultima operazione (le fasi si sovrappongono
+        nella pipeline), "secondi_lavoro" è la somma dei tempi di tutti i worker.
+        """
+        with self.lock:
+            fasi = {}
+            for fase, voce in self.fasi.items():
+                durata = voce["fine"] - voce["inizio"]
+                fasi[fase] = {
+                    "durata": round(durata, 6),
+                    "secondi_lavoro": round(voce["secondi"], 6),
+                    "file": voce["file"],
+                    "byte": voce["byte"],
+                    "file_al_secondo": round(voce["file"] / durata, 3) if durata > 0 else None,
+                    "byte_al_secondo": round(voce["byte"] / durata, 3) if durata > 0 else None,
+                }
+
+            return {
+                "durata": round(time.monotonic() - self.inizio, 6),
+                "fasi": fasi,
+                "chiamate": dict(self.chiamate),
+                "attesa_worker": {worker: round(secondi, 6) for worker, secondi in sorted(self.attese.items())},
+                "attesa_limitatore": {risorsa: round(secondi, 6) for risorsa, secondi in self.limitazioni.items()},
+                "concorrenza": {corsia: dict(voce) for corsia, voce in self.concorrenza.items()},
+            }
+
+    def in_prometheus(self, extra=None):
+        """
+        Restituisce le metriche nel formato testuale di Prometheus (per il textfile collector di node_exporter).
+
+        Args:
+            extra: Lista opzionale di tuple (nome, descrizione, valore) di metriche aggiuntive senza etichette
+        """
+        rapporto = self.rapporto()
+        righe = []
+
+        def metrica(nome, descrizione, valori):
+            righe.append(f"# HELP folder_sync_{nome} {descrizione}")
+            righe.append(f"# TYPE folder_sync_{nome} gauge")
+            for etichette, valore in valori:
+                if valore is not None:
+                    righe.append(f"folder_sync_{nome}{etichette} {valore}")
+
+        metrica("duration_seconds", "Durata della sincronizzazione.", [("", rapporto["durata"])])
+        for nome, descrizione, valore in extra or []:
+            metrica(nome, descrizione, [("", valore)])
+
+        fasi = rapporto["fasi"]
+        for chiave, nome, descrizione in (("durata", "phase_seconds", "Durata reale di ogni fase."),
+                                          ("secondi_lavoro", "phase_worker_seconds", "Tempo di lavoro cumulato dei worker per fase."),
+                                          ("file", "phase_files", "File elaborati per fase."),
+                                          ("byte", "phase_bytes", "Byte elaborati per fase."),
+                                          ("file_al_secondo", "phase_files_per_second", "File al secondo per fase."),
+                                          ("byte_al_secondo", "phase_bytes_per_second", "Byte al secondo per fase.")):
+            metrica(nome, descrizione, [(f'{{phase="{fase}"}}', voce[chiave]) for fase, voce in fasi.items()])
+
+        metrica("calls", "Chiamate al filesystem per tipo.",
+                [(f'{{call="{chiamata}"}}', numero) for chiamata, numero in rapporto["chiamate"].items()])
+        metrica("queue_wait_seconds", "Tempo di attesa di ogni worker del pianificatore.",
+                [(f'{{worker="{worker}"}}', secondi) for worker, secondi in rapporto["attesa_worker"].items()])
+        metrica("throttle_wait_seconds", "Tempo di attesa cumulato dei worker dovuto ai limiti di banda ed operazioni.",
+                [(f'{{resource="{risorsa}"}}', secondi) for risorsa, secondi in rapporto["attesa_limitatore"].items()])
+        metrica("lane_workers", "Thread attivi di ogni corsia scelti dall'autoregolazione.",
+                [(f'{{lane="{corsia}"}}', voce["attuale"]) for corsia, voce in rapporto["concorrenza"].items()])
+
+        return "\n".join(righe) + "\n"
+
+
+# ==================== OSSERVATORI ======================
+
+class OsservatoreInotify:
+    """
+    Classe che osserva le modifiche di un albero di cartelle tramite inotify (solo Linux).
+    Ogni cartella dell'albero ha un proprio watch; le cartelle create o spostate nell'albero vengono aggiunte subito.
+    Viene utilizzata dal metodo "watch" del sincronizzatore.
+    """
+
+    IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE = 0x002, 0x004, 0x008
+    IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x040, 0x080, 0x100, 0x200
+    IN_DELETE_SELF, IN_MOVE_SELF = 0x400, 0x800
+    IN_Q_OVERFLOW, IN_IGNORED, IN_ISDIR = 0x4000, 0x8000, 0x40000000
+    IN_ONLYDIR = 0x01000000
+
+    EVENTI = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_DELETE_SELF | IN_MOVE_SELF)
+    EVENTI_CARTELLA = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE  #Eventi rilevanti per le sottocartelle
+
+    INTESTAZIONE = struct.Struct("iIII")  #Struttura inotify_event: wd, mask, cookie, len (seguiti dal nome)
+
+    def __init__(self, radice):
+        """
+        Argomenti in ingresso:
+            radice: Cartella da osservare
+        """
+        if libc is None:
+            raise OSError(errno.ENOSYS, "inotify non disponibile")
+
+        self.radice = str(radice)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 fallita")
+
+        self.cartelle = {}  #Watch descriptor -> percorso della cartella relativo alla radice
+
+        try:
+            self._osserva_albero("")
+        except OSError:
+            self.chiudi()
+            raise
+
+    def _osserva_albero(self, rel_cartella):
+        #Aggiunge un watch alla cartella ed a tutte le sue sottocartelle
+        for cartella, sottocartelle, _ in os.walk(os.path.join(self.radice, rel_cartella)):
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(cartella), self.EVENTI | self.IN_ONLYDIR)
+
+            if wd < 0:
+                codice = ctypes.get_errno()
+                if codice in (errno.ENOENT, errno.ENOTDIR):
+                    continue  #La cartella è sparita nel frattempo: se ne occuperà l'evento di eliminazione
+                raise OSError(codice, f"inotify_add_watch fallita per {cartella}")  #Ad esempio limite dei watch raggiunto
+
+            rel_path = os.path.relpath(cartella, self.radice)  #La radice può arrivare con il separatore finale
+            self.cartelle[wd] = "" if rel_path == os.curdir else rel_path
+
+    def leggi(self, timeout):
+        """
+        Metodo che attende gli eventi per al massimo "timeout" secondi.
+
+        Returns:
+            Insieme dei percorsi modificati, relativi alla radice ("" se gli eventi sono andati persi
+            e l'intero albero va confrontato)
+        """
+        pronti, _, _ = select.select([self.fd], [], [], timeout)
+        if not pronti:
+            return set()
+
+        modificati = set()
+
+        while True:
+            try:
+                dati = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+
+            posizione = 0
+            while posizione < len(dati):
+                wd, maschera, _, lunghezza = self.INTESTAZIONE.unpack_from(dati, posizione)
+                posizione += self.INTESTAZIONE.size
+                nome = os.fsdecode(dati[posizione:posizione + lunghezza].rstrip(b"\0"))
+                posizione += lunghezza
+
+                if maschera & self.IN_Q_OVERFLOW:
+                    modificati.add("")  #Coda del kernel piena: alcuni eventi sono persi
+                    continue
+
+                if maschera & self.IN_IGNORED:
+                    self.cartelle.pop(wd, None)  #La cartella osservata non esiste più
+                    continue
+
+                rel_cartella = self.cartelle.get(wd)
+                if rel_cartella is None or not nome:
+                    continue  #Eventi sulla cartella stessa: li riporta già la cartella superiore
+
+                if maschera & self.IN_ISDIR and not maschera & self.EVENTI_CARTELLA:
+                    continue  #Modifiche agli attributi di una cartella: non c'è nulla da copiare
+
+                rel_path = os.path.join(rel_cartella, nome)
+                modificati.add(rel_path)
+
+                if maschera & self.IN_ISDIR and maschera & (self.IN_CREATE | self.IN_MOVED_TO):
+                    self._osserva_albero(rel_path)  #Nuova cartella: va osservata insieme alle sue sottocartelle
+
+        return modificati
+
+    def chiudi(self):
+        """Metodo che chiude il descrittore di inotify, rimuovendo tutti i watch."""
+        os.close(self.fd)
+
+
+class OsservatorePolling:
+    """
+    Classe che osserva le modifiche di un albero di cartelle confrontandone periodicamente lo stato.
+    Viene utilizzata dal metodo "watch" quando inotify non è disponibile (sistemi diversi da Linux, limite dei watch).
+    """
+
+    def __init__(self, radice, intervallo):
+        """
+        Argomenti in ingresso:
+            radice: Cartella da osservare
+            intervallo: Secondi tra due letture complete dell'albero
+        """
+        self.radice = str(radice)
+        self.intervallo = intervallo
+        self.stato = self._leggi_stato()
+        self.ultima_lettura = time.monotonic()
+
+    def _leggi_stato(self):
+        #Dizionario percorso relativo -> (dimensione, data di modifica) per i file, None per le cartelle
+        stato = {}
+        in_attesa = [""]
+
+        while in_attesa:
+            rel_cartella = in_attesa.pop()
+            try:
+                with os.scandir(os.path.join(self.radice, rel_cartella)) as voci:
+                    for voce in voci:
+                        rel_path = os.path.join(rel_cartella, voce.name)
+
+                        if voce.is_dir(follow_symlinks=False):
+                            stato[rel_path] = None
+                            in_attesa.append(rel_path)
+
+                        elif voce.is_file():
+                            stat = voce.stat()
+                            stato[rel_path] = (stat.st_size, stat.st_mtime_ns)
+
+            except (FileNotFoundError, NotADirectoryError):
+                continue  #Cartella eliminata durante la lettura
+
+        return stato
+
+    def leggi(self, timeout):
+        """
+        Metodo che attende al massimo "timeout" secondi e, se è trascorso l'intervallo, confronta lo stato dell'albero.
+
+        Returns:
+            Insieme dei percorsi modificati, relativi alla radice
+        """
+        attesa = self.ultima_lettura + self.intervallo - time.monotonic()
+        if attesa > timeout:
+            time.sleep(timeout)
+            return set()
+
+        time.sleep(max(attesa, 0))
+
+        precedente, self.stato = self.stato, self._leggi_stato()
+        self.ultima_lettura = time.monotonic()
+
+        return {rel_path for rel_path in precedente.keys() | self.stato.keys()
+                if precedente.get(rel_path, 0) != self.stato.get(rel_path, 0)}
+
+    def chiudi(self):
+        """Metodo presente per uniformità con OsservatoreInotify: non ci sono risorse da liberare."""
+
+
+# ==================== MANIFEST ======================
+
+class Manifest:
+    """
+    Indice persistente (SQLite) dei file presenti nella destinazione.
+    Per ogni file registra percorso relativo, dimensione, mtime, inode e hash del contenuto (se noto),
+    così che le sincronizzazioni successive possano confrontare la sorgente con il manifest
+    invece di rileggere l'intera destinazione.
+    """
+
+    VERSIONE_SCHEMA = 1  #Se lo schema cambia, il manifest esistente viene ricostruito
+    COMMIT_OGNI = 1000  #Numero di modifiche dopo il quale viene eseguito un commit
+
+    def __init__(self, percorso):
+        """
+        Apre (o crea) il manifest.
+
+        Args:
+            percorso: Percorso del file SQLite del manifest
+        """
+        os.makedirs(os.path.dirname(percorso), exist_ok=True)
+
+        self.percorso = percorso
+        self.lock = threading.Lock()  #La connessione viene condivisa tra i thread di scansione e di copia
+        self.conn = sqlite3.connect(percorso, check_same_thread=False)
+        self.modifiche = 0  #Modifiche non ancora confermate con commit
+
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != self.VERSIONE_SCHEMA:
+            self.conn.executescript("""
+                DROP TABLE IF EXISTS files;
+                DROP TABLE IF EXISTS cartelle;
+                DROP TABLE IF EXISTS meta;
+            """)
+
+        self.conn.executescript(f"""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS files (
+                cartella TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                hash TEXT,
+                PRIMARY KEY (cartella, nome)
+            );
+            CREATE TABLE IF NOT EXISTS cartelle (
+                rel TEXT PRIMARY KEY,
+                parent TEXT
+            );
+            CREATE INDEX IF NOT EXISTS cartelle_parent ON cartelle (parent);
+            CREATE TABLE IF NOT EXISTS meta (chiave TEXT PRIMARY KEY, valore TEXT);
+            INSERT OR IGNORE INTO cartelle VALUES ('', NULL);
+            PRAGMA user_version = {self.VERSIONE_SCHEMA};
+        """)
+        self.conn.commit()
+
+    @property
+    def completo(self):
+        """True se il manifest descrive l'intera destinazione (almeno una sincronizzazione completa terminata)."""
+        with self.lock:
+            riga = self.conn.execute("SELECT valore FROM meta WHERE chiave = 'completo'").fetchone()
+        return riga is not None and riga[0] == "1"
+
+    def segna_completo(self, completo=True):
+        """Registra (con commit immediato) se il manifest descrive l'intera destinazione."""
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('completo', ?)", ("1" if completo else "0",))
+            self.conn.commit()
+            self.modifiche = 0
+
+    def elenca(self, rel_cartella):
+        """
+        Restituisce il contenuto registrato di una cartella, nello stesso formato di "_elenca_cartella".
+
+        Args:
+            rel_cartella: Percorso della cartella relativo alla destinazione
+
+        Returns:
+            Tupla (files, cartelle) con il dizionario {nome: VoceManifest} e l'insieme delle sottocartelle,
+            oppure None se la cartella non è registrata
+        """
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM cartelle WHERE rel = ?", (rel_cartella,)).fetchone() is None:
+                return None
+
+            righe = self.conn.execute("SELECT nome, size, mtime_ns, ino, hash FROM files WHERE cartella = ?",
+                                      (rel_cartella,)).fetchall()
+            sottocartelle = self.conn.execute("SELECT rel FROM cartelle WHERE parent = ?",
+                                              (rel_cartella,)).fetchall()
+
+        files = {nome: VoceManifest(size, mtime_ns, ino, hash_value) for nome, size, mtime_ns, ino, hash_value in righe}
+        cartelle = {os.path.basename(rel) for (rel,) in sottocartelle}
+
+        return files, cartelle
+
+    def _registra_cartella(self, rel_cartella):
+        #Registra la cartella e tutte le cartelle che la contengono (da chiamare con il lock acquisito)
+        while rel_cartella:
+            parent = os.path.dirname(rel_cartella)
+            self.conn.execute("INSERT OR IGNORE INTO cartelle VALUES (?, ?)", (rel_cartella, parent))
+            rel_cartella = parent
+
+    def registra(self, rel_file, stat, hash_value=None):
+        """
+        Registra (o aggiorna) un file presente nella destinazione.
+
+        Args:
+            rel_file: Percorso del file relativo alla destinazione
+            stat: Risultato di stat() del file nella destinazione
+            hash_value: Hash del contenuto, se noto
+        """
+        cartella, nome = os.path.split(rel_file)
+
+        with self.lock:
+            self._registra_cartella(cartella)
+            self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                              (cartella, nome, stat.st_size, stat.st_mtime_ns, stat.st_ino, hash_value))
+            self._conferma()
+
+    def hash_registrato(self, rel_file, algoritmo, stat=None):
+        """
+        Restituisce l'hash registrato per un file con l'algoritmo indicato, oppure None se non è noto.
+
+        Args:
+            rel_file: Percorso del file relativo alla destinazione
+            algoritmo: Algoritmo dell'hash richiesto
+            stat: Risultato di stat() del file reale; se indicato, l'hash viene restituito solo se
+                  dimensione, mtime ed inode coincidono con quelli registrati
+        """
+        cartella, nome = os.path.split(rel_file)
+
+        with self.lock:
+            riga = self.conn.execute("SELECT hash, size, mtime_ns, ino FROM files WHERE cartella = ? AND nome = ?",
+                                     (cartella, nome)).fetchone()
+
+        #Gli hash sono memorizzati nella forma "algoritmo:valore"
+        if riga is None or riga[0] is None or not riga[0].startswith(algoritmo + ":"):
+            return None
+
+        if stat is not None and (stat.st_size, stat.st_mtime_ns, stat.st_ino) != riga[1:]:
+            return None  #Il file è stato modificato dopo la registrazione: l'hash non vale più
+
+        return riga[0][len(algoritmo) + 1:]
+
+    def imposta_hash(self, rel_file, hash_value, algoritmo):
+        """Memorizza l'hash del contenuto di un file già registrato."""
+        cartella, nome = os.path.split(rel_file)
+
+        with self.lock:
+            self.conn.execute("UPDATE files SET hash = ? WHERE cartella = ? AND nome = ?",
+                              (f"{algoritmo}:{hash_value}", cartella, nome))
+            self._conferma()
+
+    def rimuovi(self, rel_file):
+        """Rimuove un file dal manifest."""
+        cartella, nome = os.path.split(rel_file)
+
+        with self.lock:
+            self.conn.execute("DELETE FROM files WHERE cartella = ? AND nome = ?", (cartella, nome))
+            self._conferma()
+
+    def rimuovi_cartella(self, rel_cartella):
+        """Rimuove dal manifest una cartella con tutti i file e le sottocartelle che contiene."""
+        prefisso = rel_cartella + os.sep
+
+        with self.lock:
+            self.conn.execute("DELETE FROM files WHERE cartella = ? OR substr(cartella, 1, ?) = ?",
+                              (rel_cartella, len(prefisso), prefisso))
+            self.conn.execute("DELETE FROM cartelle WHERE rel = ? OR substr(rel, 1, ?) = ?",
+                              (rel_cartella, len(prefisso), prefisso))
+            self._conferma()
+
+    def _conferma(self):
+        #Le modifiche vengono confermate a blocchi: in caso di interruzione si perdono al massimo le ultime,
+        #e la sincronizzazione successiva si limita a ripetere copie ed eliminazioni già fatte
+        self.modifiche += 1
+        if self.modifiche >= self.COMMIT_OGNI:
+            self.conn.commit()
+            self.modifiche = 0
+
+    def chiudi(self):
+        """Conferma le modifiche in sospeso e chiude il database."""
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+# ==================== DIARIO ======================
+
+class Diario:
+    """
+    Diario persistente (SQLite) del piano di una sincronizzazione in corso.
+    Registra le azioni man mano che la scansione le produce e segna quelle completate; le modifiche
+    vengono confermate a intervalli regolari (checkpoint). Se la sincronizzazione viene interrotta dopo
+    la fine della scansione, la successiva riprende dalle sole azioni non completate, senza scansionare
+    di nuovo e senza ripetere le copie già terminate.
+    """
+
+    VERSIONE_SCHEMA = 1  #Se lo schema cambia, il diario esistente viene scartato
+    COMMIT_OGNI = 1000  #Numero di modifiche dopo il quale viene eseguito un checkpoint
+
+    def __init__(self, percorso, intervallo=5.0):
+        """
+        Apre (o crea) il diario.
+
+        Args:
+            percorso: Percorso del file SQLite del diario
+            intervallo: Secondi massimi tra due checkpoint
+        """
+        os.makedirs(os.path.dirname(percorso), exist_ok=True)
+
+        self.percorso = percorso
+        self.intervallo = intervallo
+        self.lock = threading.Lock()  #La connessione viene condivisa tra il thread di scansione e quello dei risultati
+        self.conn = sqlite3.connect(percorso, check_same_thread=False)
+        self.modifiche = 0
+        self.ultimo_checkpoint = time.monotonic()
+
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != self.VERSIONE_SCHEMA:
+            self.conn.executescript("""
+                DROP TABLE IF EXISTS azioni;
+                DROP TABLE IF EXISTS meta;
+            """)
+
+        self.conn.executescript(f"""
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS azioni (
+                dst TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                src TEXT,
+                fatto INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS meta (chiave TEXT PRIMARY KEY, valore TEXT);
+            PRAGMA user_version = {self.VERSIONE_SCHEMA};
+        """)
+        self.conn.commit()
+
+    def _meta(self, chiave):
+        #Legge un valore della tabella meta (da chiamare con il lock acquisito)
+        riga = self.conn.execute("SELECT valore FROM meta WHERE chiave = ?", (chiave,)).fetchone()
+        return riga[0] if riga is not None else None
+
+    def riprendibile(self, configurazione):
+        """True se il diario contiene il piano completo di una sincronizzazione interrotta con la stessa configurazione."""
+        with self.lock:
+            return self._meta("stato") == "esecuzione" and self._meta("configurazione") == configurazione
+
+    def inizia(self, configurazione):
+        """Svuota il diario per un nuovo piano."""
+        with self.lock:
+            self.conn.execute("DELETE FROM azioni")
+            self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                  [("stato", "scansione"), ("configurazione", configurazione)])
+            self.conn.commit()
+
+    def registra(self, azione):
+        """Aggiunge un'azione del piano."""
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO azioni VALUES (?, ?, ?, 0)", (azione.dst, azione.tipo, azione.src))
+            self._conferma()
+
+    def fine_scansione(self):
+        """Segna che il piano è completo: da qui in poi una sincronizzazione interrotta può essere ripresa."""
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('stato', 'esecuzione')")
+            self.conn.commit()
+
+    def completa(self, dst):
+        """Segna come completata l'azione sul percorso di destinazione indicato."""
+        with self.lock:
+            self.conn.execute("UPDATE azioni SET fatto = 1 WHERE dst = ?", (dst,))
+            self._conferma()
+
+    def conta(self):
+        """Restituisce la tupla (azioni totali, azioni completate)."""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*), COALESCE(SUM(fatto), 0) FROM azioni").fetchone()
+
+    def in_sospeso(self, lotto=1000):
+        """
+        Generatore delle azioni non completate, lette a blocchi per non caricare l'intero piano in memoria.
+
+        Yields:
+            Tuple (tipo, src, dst)
+        """
+        ultimo = 0
+        while True:
+            with self.lock:
+                righe = self.conn.execute("SELECT rowid, tipo, src, dst FROM azioni WHERE fatto = 0 AND rowid > ? "
+                                          "ORDER BY rowid LIMIT ?", (ultimo, lotto)).fetchall()
+            if not righe:
+                return
+
+            for ultimo, tipo, src, dst in righe:
+                yield tipo, src, dst
+
+    def _conferma(self):
+        #Checkpoint ogni COMMIT_OGNI modifiche oppure ogni "intervallo" secondi (da chiamare con il lock acquisito)
+        self.modifiche += 1
+        if self.modifiche >= self.COMMIT_OGNI or time.monotonic() - self.ultimo_checkpoint >= self.intervallo:
+            self.conn.commit()
+            self.modifiche = 0
+            self.ultimo_checkpoint = time.monotonic()
+
+    def chiudi(self, elimina=False):
+        """
+        Conferma le modifiche in sospeso e chiude il database.
+
+        Args:
+            elimina: True per eliminare il diario (sincronizzazione terminata, nulla da riprendere)
+        """
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+        if elimina:
+            os.remove(self.percorso)
+
+# ==================== CACHE HASH ======================
+
+class CacheHash:
+    """
+    Cache persistente (SQLite) degli hash dei file, con dimensione massima ed eliminazione LRU.
+    Ogni voce è identificata da dispositivo ed inode del file ed è valida solo finché
+    dimensione, mtime_ns ed algoritmo di hash restano quelli registrati.
+    """
+
+    VERSIONE_SCHEMA = 1  #Se lo schema cambia, la cache esistente viene svuotata
+    COMMIT_OGNI = 1000  #Numero di modifiche dopo il quale viene eseguito un commit
+
+    def __init__(self, percorso, max_voci=1000000, algoritmo="md5"):
+        """
+        Apre (o crea) la cache.
+
+        Args:
+            percorso: Percorso del file SQLite della cache
+            max_voci: Numero massimo di hash conservati; i meno usati di recente vengono eliminati
+            algoritmo: Algoritmo di hash delle voci cercate e memorizzate
+        """
+        os.makedirs(os.path.dirname(percorso), exist_ok=True)
+
+        self.percorso = percorso
+        self.max_voci = max_voci
+        self.prefisso = algoritmo + ":"  #Gli hash sono memorizzati nella forma "algoritmo:valore"
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(percorso, check_same_thread=False)
+        self.modifiche = 0
+        self.utilizzo = time.time_ns()  #Contatore crescente che ordina le voci per ultimo utilizzo
+        self.trovati = 0  #Statistiche della sessione
+        self.mancanti = 0
+
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != self.VERSIONE_SCHEMA:
+            self.conn.execute("DROP TABLE IF EXISTS hash")
+
+        self.conn.executescript(f"""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS hash (
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                uso INTEGER NOT NULL,
+                PRIMARY KEY (dev, ino)
+            );
+            CREATE INDEX IF NOT EXISTS hash_uso ON hash (uso);
+            PRAGMA user_version = {self.VERSIONE_SCHEMA};
+        """)
+        self.conn.commit()
+
+    def cerca(self, stat):
+        """
+        Cerca l'hash di un file.
+
+        Args:
+            stat: Risultato di stat() del file
+
+        Returns:
+            L'hash memorizzato, oppure None se assente o se il file è cambiato
+        """
+        with self.lock:
+            riga = self.conn.execute("SELECT size, mtime_ns, hash FROM hash WHERE dev = ? AND ino = ?",
+                                     (stat.st_dev, stat.st_ino)).fetchone()
+
+            if riga is None or (riga[0], riga[1]) != (stat.st_size, stat.st_mtime_ns) or not riga[2].startswith(self.prefisso):
+                self.mancanti += 1
+                return None
+
+            self.utilizzo += 1
+            self.conn.execute("UPDATE hash SET uso = ? WHERE dev = ? AND ino = ?", (self.utilizzo, stat.st_dev, stat.st_ino))
+            self._conferma()
+            self.trovati += 1
+
+            return riga[2][len(self.prefisso):]
+
+    def memorizza(self, stat, hash_value):
+        """
+        Memorizza l'hash di un file.
+
+        Args:
+            stat: Risultato di stat() del file, ottenuto prima di calcolarne l'hash
+            hash_value: Hash del contenuto
+        """
+        with self.lock:
+            self.utilizzo += 1
+            self.conn.execute("INSERT OR REPLACE INTO hash VALUES (?, ?, ?, ?, ?, ?)",
+                              (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, self.prefisso + hash_value,
+                               self.utilizzo))
+            self._conferma()
+
+    def _conferma(self):
+        #Le modifiche vengono confermate a blocchi (da chiamare con il lock acquisito); ad ogni blocco viene
+        #applicato anche il limite di voci, così che la cache non cresca durante "watch" o sincronizzazioni lunghe
+        self.modifiche += 1
+        if self.modifiche >= self.COMMIT_OGNI:
+            self._elimina_in_eccesso()
+            self.conn.commit()
+            self.modifiche = 0
+
+    def _elimina_in_eccesso(self):
+        #Elimina le voci usate meno di recente oltre "max_voci" (da chiamare con il lock acquisito)
+        in_eccesso = self.conn.execute("SELECT COUNT(*) FROM hash").fetchone()[0] - self.max_voci
+
+        if in_eccesso > 0:
+            self.conn.execute("DELETE FROM hash WHERE rowid IN (SELECT rowid FROM hash ORDER BY uso LIMIT ?)",
+                              (in_eccesso,))
+
+    def chiudi(self):
+        """Elimina le voci usate meno di recente oltre "max_voci", conferma le modifiche e chiude il database."""
+        with self.lock:
+            self._elimina_in_eccesso()
+            self.conn.commit()
+            self.conn.close()
+
+# ==================== LIMITI DI BANDA ED OPERAZIONI ======================
+
+class SecchioGettoni:
+    """
+    Limitatore a secchio di gettoni (token bucket), condiviso tra i thread: i gettoni si accumulano alla
+    velocità indicata fino alla capacità del secchio ed ogni operazione ne preleva quanti ne consuma
+    (byte oppure operazioni). Se non bastano, il prelievo viene comunque prenotato ed il thread attende
+    il tempo necessario a ripagarlo, così che la media non superi mai la velocità anche con blocchi grandi.
+    """
+
+    def __init__(self, velocita, capacita=None):
+        """
+        Args:
+            velocita: Gettoni al secondo (byte/s oppure operazioni/s)
+            capacita: Gettoni accumulabili, cioè la raffica massima (default: un secondo di velocità)
+        """
+        if velocita <= 0:
+            raise ValueError(f"Velocità del limitatore non valida: {velocita}")
+
+        self.velocita = velocita
+        self.capacita = capacita if capacita is not None else max(velocita, 1)
+        self.gettoni = self.capacita
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def attendi(self, quantita=1):
+        """
+        Preleva "quantita" gettoni, attendendo se il secchio è vuoto.
+
+        Returns:
+            Secondi di attesa
+        """
+        with self.lock:
+            adesso = time.monotonic()
+            self.gettoni = min(self.capacita, self.gettoni + (adesso - self.ultimo) * self.velocita)
+            self.ultimo = adesso
+            self.gettoni -= quantita  #Può diventare negativo: i thread successivi attendono anche questo debito
+            attesa = -self.gettoni / self.velocita if self.gettoni < 0 else 0.0
+
+        if attesa > 0:
+            time.sleep(attesa)
+
+        return attesa
+
+
+class AutoregolatoreConcorrenza:
+    """
+    Classe che regola la concorrenza delle corsie di un PianificatoreCopie in base al rendimento misurato.
+    Ad ogni intervallo confronta la velocità di ogni corsia (file al secondo per i file piccoli, byte al
+    secondo per i file grandi) con quella dell'intervallo precedente: se è cresciuta continua a modificare
+    i thread nella stessa direzione, se è calata inverte la direzione; se è rimasta stabile mentre la latenza
+    di ogni lavoro è cresciuta, riduce i thread, che aggiungerebbero solo attesa (disco saturo o limite di banda).
+    """
+
+    VARIAZIONE = 0.05  #Variazione relativa della velocità o della latenza considerata significativa
+
+    def __init__(self, pianificatore, intervallo=2.0, metriche=None):
+        """
+        Avvia il thread di regolazione.
+
+        Args:
+            pianificatore: PianificatoreCopie da regolare
+            intervallo: Secondi tra due misure
+            metriche: Oggetto Metriche in cui registrare la concorrenza scelta (None: nessuna registrazione)
+        """
+        self.pianificatore = pianificatore
+        self.intervallo = intervallo
+        self.metriche = metriche
+        self.fermo = threading.Event()
+
+        #Per ogni corsia: velocità e latenza dell'ultimo intervallo, direzione corrente e contatori letti
+        self.stato = {corsia: {"velocita": None, "latenza": None, "direzione": 1,
+                               "contatori": pianificatore.statistiche(corsia)[:3]}
+                      for corsia in pianificatore.corsie}
+
+        if metriche is not None:
+            for corsia, thread in pianificatore.concorrenza.items():
+                metriche.regolazione(corsia, thread)
+
+        self.thread = threading.Thread(target=self._regola, name="autoregolatore", daemon=True)
+        self.thread.start()
+
+    def ferma(self):
+        """Ferma il thread di regolazione."""
+        self.fermo.set()
+
+    def _regola(self):
+        #Ciclo del thread: una misura (e al più una regolazione per corsia) ogni "intervallo" secondi
+        while not self.fermo.wait(self.intervallo):
+            for corsia in self.stato:
+                self._regola_corsia(corsia)
+
+    def _regola_corsia(self, corsia):
+        #Confronta l'ultimo intervallo con il precedente e sposta la concorrenza della corsia di un passo
+        stato = self.stato[corsia]
+        lavori, byte, secondi, in_coda = self.pianificatore.statistiche(corsia)
+        lavori_prima, byte_prima, secondi_prima = stato["contatori"]
+        stato["contatori"] = (lavori, byte, secondi)
+        completati = lavori - lavori_prima
+
+        if not completati or not in_coda:
+            return  #Corsia inattiva o senza lavori in attesa: la velocità dipende dalla scansione, non dai thread
+
+        velocita = (byte - byte_prima if corsia == "grandi" else completati) / self.intervallo
+        latenza = (secondi - secondi_prima) / completati
+
+        if stato["velocita"] is not None:
+            if velocita < stato["velocita"] * (1 - self.VARIAZIONE):
+                stato["direzione"] = -stato["direzione"]  #L'ultimo passo ha peggiorato: si torna indietro
+            elif velocita <= stato["velocita"] * (1 + self.VARIAZIONE) and latenza > stato["latenza"] * (1 + self.VARIAZIONE):
+                stato["direzione"] = -1  #Stessa velocità con più attesa per lavoro: i thread in più sono inutili
+
+        stato["velocita"] = velocita
+        stato["latenza"] = latenza
+
+        attuale = self.pianificatore.concorrenza[corsia]
+        nuova = self.pianificatore.imposta_concorrenza(corsia, attuale + stato["direzione"] * max(1, attuale // 4))
+
+        if nuova == attuale:  #Limite raggiunto: al prossimo intervallo si prova nella direzione opposta
+            stato["direzione"] = -stato["direzione"]
+
+        if self.metriche is not None:
+            self.metriche.regolazione(corsia, nuova)
+
+# ==================== PIANIFICATORE COPIE ======================
+
+class PianificatoreCopie:
+    """
+    Pianificatore delle copie a due corsie: una per i file piccoli, servita da molti thread,
+    ed una per i file grandi, servita da pochi thread, così che pochi file enormi non occupino
+    tutti i worker e migliaia di file piccoli non lascino i dischi poco sfruttati.
+    In ogni corsia i lavori vengono eseguiti dal più grande al più piccolo; opzionalmente
+    viene limitato il numero totale di byte in copia nello stesso momento. Il numero di thread
+    di ogni corsia che lavorano contemporaneamente può essere modificato durante l'esecuzione
+    (vedi "imposta_concorrenza" e la classe AutoregolatoreConcorrenza).
+    """
+
+    FINE = object()  #Segnale di fine dei risultati
+
+    def __init__(self, esegui, soglia_grandi, thread_piccoli, thread_grandi, max_byte_in_volo=None, max_in_coda=None,
+                 metriche=None, massimo_thread=None, intervallo_autoregolazione=None):
+        """
+        Avvia i thread delle due corsie.
+
+        Args:
+            esegui: Funzione che riceve un lavoro e restituisce una tupla (success, message)
+            soglia_grandi: Dimensione in byte da cui un file viene assegnato alla corsia dei file grandi
+            thread_piccoli: Numero di thread della corsia dei file piccoli
+            thread_grandi: Numero di thread della corsia dei file grandi
+            max_byte_in_volo: Numero massimo di byte in copia contemporaneamente (None: nessun limite)
+            max_in_coda: Numero massimo di lavori in attesa; oltre questo limite "aggiungi" attende (None: nessun limite)
+            metriche: Oggetto Metriche in cui registrare il tempo di attesa di ogni thread (None: nessuna registrazione)
+            massimo_thread: Thread avviati per ogni corsia, fino ai quali la concorrenza può crescere
+                            (None: solo quelli iniziali, la concorrenza può soltanto diminuire)
+            intervallo_autoregolazione: Secondi tra due regolazioni automatiche della concorrenza
+                                        (None: nessuna regolazione automatica)
+        """
+        self.esegui = esegui
+        self.soglia_grandi = soglia_grandi
+        self.max_byte_in_volo = max_byte_in_volo
+        self.max_in_coda = max_in_coda
+        self.metriche = metriche
+
+        self.condizione = threading.Condition()  #Protegge le corsie ed il conteggio dei byte in volo
+        self.corsie = {"piccoli": [], "grandi": []}  #Heap di tuple (-dimensione, sequenza, lavoro)
+        self.sequenza = count()  #A parità di dimensione conserva l'ordine di arrivo
+        self.in_coda = 0
+        self.byte_in_volo = 0
+        self.chiuso = False
+
+        #Per ogni corsia: thread che possono lavorare contemporaneamente, thread al lavoro
+        #e contatori dei lavori completati [lavori, byte, secondi di esecuzione] letti dall'autoregolazione
+        self.concorrenza = {"piccoli": max(1, thread_piccoli), "grandi": max(1, thread_grandi)}
+        self.occupati = {"piccoli": 0, "grandi": 0}
+        self.completati = {"piccoli": [0, 0, 0.0], "grandi": [0, 0, 0.0]}
+        self.thread_corsia = {corsia: max(numero, massimo_thread or 0) for corsia, numero in self.concorrenza.items()}
+
+        self.risultati = queue.Queue()  #Tuple (lavoro, risultato) dei lavori completati, nell'ordine di completamento
+        self.thread = [threading.Thread(target=self._lavora, args=(corsia,), name=f"{corsia}-{indice}", daemon=True)
+                       for corsia, numero in self.thread_corsia.items()
+                       for indice in range(numero)]
+        self.thread_attivi = len(self.thread)
+
+        for thread in self.thread:
+            thread.start()
+
+        self.autoregolatore = None
+        if intervallo_autoregolazione is not None:
+            self.autoregolatore = AutoregolatoreConcorrenza(self, intervallo_autoregolazione, metriche)
+
+    def aggiungi(self, dimensione, lavoro):
+        """
+        Accoda un lavoro nella corsia corrispondente alla sua dimensione.
+
+        Args:
+            dimensione: Dimensione in byte del file da copiare
+            lavoro: Oggetto passato alla funzione "esegui"
+        """
+        corsia = "grandi" if dimensione >= self.soglia_grandi else "piccoli"
+
+        with self.condizione:
+            while self.max_in_coda is not None and self.in_coda >= self.max_in_coda:
+                self.condizione.wait()  #Coda piena: si attende che i thread prendano in carico dei lavori
+
+            heapq.heappush(self.corsie[corsia], (-dimensione, next(self.sequenza), lavoro))
+            self.in_coda += 1
+            self.condizione.notify_all()
+
+    def chiudi(self):
+        """Segnala che non verranno aggiunti altri lavori: i thread terminano dopo aver svuotato le corsie."""
+        with self.condizione:
+            self.chiuso = True
+            self.condizione.notify_all()
+
+    def __iter__(self):
+        """Restituisce le tuple (lavoro, (success, message)) man mano che i lavori vengono completati, fino alla chiusura."""
+        return iter(self.risultati.get, self.FINE)
+
+    def imposta_concorrenza(self, corsia, numero):
+        """
+        Modifica il numero di thread della corsia che possono lavorare contemporaneamente.
+
+        Args:
+            corsia: "piccoli" oppure "grandi"
+            numero: Thread desiderati, ricondotti tra 1 ed il numero di thread avviati per la corsia
+
+        Returns:
+            Concorrenza effettivamente impostata
+        """
+        with self.condizione:
+            self.concorrenza[corsia] = max(1, min(numero, self.thread_corsia[corsia]))
+            self.condizione.notify_all()
+            return self.concorrenza[corsia]
+
+    def statistiche(self, corsia):
+        """Restituisce la tupla (lavori completati, byte, secondi di esecuzione cumulati, lavori in coda) di una corsia."""
+        with self.condizione:
+            lavori, byte, secondi = self.completati[corsia]
+            return lavori, byte, secondi, len(self.corsie[corsia])
+
+    def _preleva(self, corsia):
+        #Preleva il lavoro più grande della corsia quando la concorrenza ed il limite di byte lo consentono
+        #(da chiamare con la condizione acquisita); restituisce (lavoro, dimensione, byte impegnati)
+        coda = self.corsie[corsia]
+
+        while True:
+            if coda:
+                dimensione = -coda[0][0]
+                #Un file più grande del limite viene conteggiato come il limite stesso, per non bloccarlo per sempre
+                impegno = dimensione if self.max_byte_in_volo is None else min(dimensione, self.max_byte_in_volo)
+
+                if self.occupati[corsia] < self.concorrenza[corsia] and \
+                        (self.max_byte_in_volo is None or self.byte_in_volo + impegno <= self.max_byte_in_volo):
+                    lavoro = heapq.heappop(coda)[2]
+                    self.in_coda -= 1
+                    self.byte_in_volo += impegno
+                    self.occupati[corsia] += 1
+                    self.condizione.notify_all()
+                    return lavoro, dimensione, impegno
+
+            elif self.chiuso:
+                return None, 0, 0
+
+            self.condizione.wait()
+
+    def _lavora(self, corsia):
+        #Ciclo di un thread della corsia: preleva ed esegue lavori fino alla chiusura
+        while True:
+            inizio = time.monotonic()
+
+            with self.condizione:
+                lavoro, dimensione, impegno = self._preleva(corsia)
+
+            if self.metriche is not None:
+                self.metriche.attesa(threading.current_thread().name, time.monotonic() - inizio)
+
+            if lavoro is None:
+                break
+
+            inizio = time.monotonic()
+
+            try:
+                risultato = self.esegui(lavoro)
+            except Exception as e:
+                risultato = (False, f"\nErrore: {str(e)}")
+
+            with self.condizione:
+                self.byte_in_volo -= impegno
+                self.occupati[corsia] -= 1
+                completati = self.completati[corsia]
+                completati[0] += 1
+                completati[1] += dimensione
+                completati[2] += time.monotonic() - inizio
+                self.condizione.notify_all()
+
+            self.risultati.put((lavoro, risultato))
+
+        with self.condizione:
+            self.thread_attivi -= 1
+            ultimo = self.thread_attivi == 0
+
+        if ultimo:  #L'ultimo thread che termina segnala la fine dei risultati
+            if self.autoregolatore is not None:
+                self.autoregolatore.ferma()
+            self.risultati.put(self.FINE)
+
+class FolderSynchronizer:
+    """
+    Classe per sincronizzare due cartelle usando threading e multiprocessing.
+    """
+
+    def __init__(self, source, destination, workers=4, use_hash=False, use_manifest=False, validate_manifest=False,
+                 hash_cache=False, hash_cache_size=1000000, hash_algorithm="md5", compare_mode=None,
+                 sample_blocks=8, sample_block_size=64 * 1024, sample_escalate=True,
+                 delta_threshold=None, delta_block_size=256 * 1024,
+                 hash_executor="thread", hash_batch_bytes=64 * 1024 ** 2, hash_batch_files=256,
+                 copy_buffer_size=8 * 1024 ** 2, use_reflink=True,
+                 small_file_threshold=1024 ** 2, small_file_workers=None, large_file_workers=None,
+                 max_bytes_in_flight=None, pipeline_queue_size=10000, metadata_concurrency=128,
+                 data_concurrency=None, quiet=False, progress_interval=5.0, metrics_file=None, metrics_format="json",
+                 resume=False, checkpoint_interval=5.0, max_bytes_per_second=None, max_ops_per_second=None,
+                 autotune=False, autotune_interval=2.0, autotune_max_workers=None):
+        """
+        Inizializza il sincronizzatore.
+
+        Args:
+            source: Percorso cartella sorgente
+            destination: Percorso cartella destinazione
+            workers: Numero di thread/processi paralleli (default: 4)
+            use_hash: Se True, usa l'hash del contenuto per verificare i file (più lento ma più sicuro)
+            use_manifest: Se True, mantiene un manifest della destinazione e lo usa al posto di rileggerla
+            validate_manifest: Se True, ogni voce del manifest viene controllata con uno stat() del file in destinazione
+            hash_cache: True per usare la cache persistente degli hash nella destinazione, oppure il percorso del file di cache
+            hash_cache_size: Numero massimo di hash conservati nella cache (default: 1000000)
+            hash_algorithm: Algoritmo di hash (default: "md5"); ad esempio "blake2b", oppure "xxh3_128" e "blake3"
+                            se sono installati i pacchetti opzionali
+            compare_mode: Modalità di confronto dei file già presenti nella destinazione:
+                          "mtime" (data di modifica), "sample" (impronta a campione) oppure "hash" (hash completo);
+                          se None viene scelta in base a "use_hash"
+            sample_blocks: Numero di blocchi equidistanti letti, oltre ad inizio e fine, per l'impronta a campione (default: 8)
+            sample_block_size: Dimensione in byte di ogni blocco dell'impronta a campione (default: 64 KB)
+            sample_escalate: Se True, in modalità "sample" i file con impronte uguali ma date di modifica diverse
+                             vengono verificati con l'hash completo (default: True)
+            delta_threshold: Dimensione in byte oltre la quale i file già presenti nella destinazione vengono
+                             aggiornati riscrivendo solo i blocchi modificati (default: None, disattivato)
+            delta_block_size: Dimensione in byte dei blocchi confrontati dalla copia delta (default: 256 KB)
+            hash_executor: "thread" oppure "process", tipo di worker che calcolano gli hash (default: "thread",
+                           conveniente perché hashlib rilascia il GIL durante il calcolo)
+            hash_batch_bytes: Byte da leggere per ogni lotto inviato ai worker di hash (default: 64 MB)
+            hash_batch_files: Numero massimo di coppie di file per lotto (default: 256)
+            copy_buffer_size: Dimensione in byte dei blocchi della copia (default: 8 MB)
+            use_reflink: Se True, sui filesystem che lo supportano i file vengono clonati (reflink) invece che copiati
+            small_file_threshold: Dimensione in byte sotto la quale un file viene copiato nella corsia dei file piccoli (default: 1 MB)
+            small_file_workers: Thread della corsia dei file piccoli (default: 4 volte "workers")
+            large_file_workers: Thread della corsia dei file grandi (default: metà di "workers", almeno 1)
+            max_bytes_in_flight: Numero massimo di byte in copia contemporaneamente (default: None, nessun limite)
+            pipeline_queue_size: Numero massimo di azioni in attesa tra una fase e l'altra della pipeline (default: 10000)
+            metadata_concurrency: Operazioni sui metadati (letture di cartelle, stat, eliminazioni) contemporanee in "sync_async" (default: 128)
+            data_concurrency: Copie e verifiche contemporanee in "sync_async" (default: None, uguale a "workers")
+            quiet: True per mostrare l'avanzamento periodico invece di una riga per ogni file (default: False)
+            progress_interval: Secondi tra due righe di avanzamento in modalità "quiet" (default: 5.0)
+            metrics_file: Percorso in cui scrivere il rapporto delle metriche al termine (default: None, nessun rapporto)
+            metrics_format: Formato del rapporto, "json" oppure "prometheus" (default: "json")
+            resume: Se True, "sync" registra il piano in un diario nella destinazione e, se la sincronizzazione
+                    precedente è stata interrotta, riprende dalle azioni rimaste senza scansionare di nuovo
+            checkpoint_interval: Secondi massimi tra due salvataggi del diario (default: 5.0)
+            max_bytes_per_second: Byte al secondo copiati al massimo, da tutti i worker insieme (default: None, nessun limite)
+            max_ops_per_second: Operazioni al secondo al massimo (file copiati, file e cartelle eliminati) (default: None, nessun limite)
+            autotune: Se True, i thread delle due corsie del pianificatore vengono aumentati o ridotti
+                      in base alla velocità ed alla latenza misurate durante la copia
+            autotune_interval: Secondi tra due regolazioni automatiche (default: 2.0)
+            autotune_max_workers: Thread massimi per corsia con "autotune" (default: 4 volte "small_file_workers")
+        """
+        if compare_mode is None:
+            compare_mode = "hash" if use_hash else "mtime"
+
+        if compare_mode not in ("mtime", "sample", "hash"):
+            raise ValueError(f"Modalità di confronto non valida: {compare_mode}")
+
+        if hash_executor not in ("thread", "process"):
+            raise ValueError(f"Tipo di worker non valido: {hash_executor}")
+
+        crea_hash(hash_algorithm)  #Verifica subito che l'algoritmo sia disponibile (solleva ValueError)
+
+        self.source = Path(source)
+        self.destination = Path(destination)
+        self.workers = workers
+        self.compare_mode = compare_mode
+        self.use_hash = compare_mode == "hash"
+        self.sample_blocks = sample_blocks
+        self.sample_block_size = sample_block_size
+        self.sample_escalate = sample_escalate
+        self.delta_threshold = delta_threshold
+        self.delta_block_size = delta_block_size
+        self.hash_executor = hash_executor
+        self.hash_batch_bytes = hash_batch_bytes
+        self.hash_batch_files = hash_batch_files
+        self.copy_buffer_size = copy_buffer_size
+        self.use_reflink = use_reflink
+        self.small_file_threshold = small_file_threshold
+        self.small_file_workers = small_file_workers if small_file_workers is not None else workers * 4
+        self.large_file_workers = large_file_workers if large_file_workers is not None else max(1, workers // 2)
+        self.max_bytes_in_flight = max_bytes_in_flight
+        self.pipeline_queue_size = pipeline_queue_size
+        self.metadata_concurrency = metadata_concurrency
+        self.data_concurrency = data_concurrency or workers
+        self.quiet = quiet
+        self.progress_interval = progress_interval
+        self.metrics_file = metrics_file
+        self.metrics_format = metrics_format
+
+        if metrics_format not in ("json", "prometheus"):
+            raise ValueError(f"Formato delle metriche non valido: {metrics_format}")
+
+        self.max_bytes_per_second = max_bytes_per_second
+        self.max_ops_per_second = max_ops_per_second
+        self._crea_limitatori()  #Solleva ValueError se i limiti non sono validi
+
+        self.autotune = autotune
+        self.autotune_interval = autotune_interval
+        self.autotune_max_workers = autotune_max_workers or self.small_file_workers * 4
+
+        self.metriche = Metriche()  #Metriche della sincronizzazione in corso (vedi classe Metriche)
+        self.ultimo_avanzamento = 0.0
+
+        self.resume = resume
+        self.checkpoint_interval = checkpoint_interval
+        self.diario = None  #Diario del piano aperto durante la sincronizzazione (vedi "apri_diario")
+
+        #Identifica i file temporanei di questa esecuzione, per non confonderli con quelli lasciati da copie interrotte
+        self.id_esecuzione = os.urandom(4).hex()
+        self.copie_avviate = count()  #Numera i temporanei: ogni copia ha il proprio, anche se lo stesso file viene copiato due volte
+        self.cartelle_pulite = set()  #Cartelle della destinazione già ripulite dai temporanei orfani (vedi "_pulisci_temporanei")
+
+        self.use_manifest = use_manifest
+        self.validate_manifest = validate_manifest
+
+        self.manifest = None  #Manifest aperto durante la sincronizzazione (vedi "apri_manifest")
+        self.manifest_attivo = False  #True se la destinazione viene letta dal manifest invece che dal disco
+        self.scansione_incompleta = False  #True se la scansione ha saltato delle cartelle: il manifest non è completo
+
+        self.hash_algorithm = hash_algorithm
+        self.hash_cache = hash_cache
+        self.hash_cache_size = hash_cache_size
+        self.cache_hash = None  #Cache degli hash aperta durante la sincronizzazione (vedi "apri_cache_hash")
+
+        # Statistiche
+        self.files_copied = 0
+        self.files_deleted = 0
+        self.folders_deleted = 0
+        self.errors = []
+        self.strategie_copia = Counter()  #Numero di file copiati con ciascuna strategia (vedi "copia_contenuto")
+        self.lock_statistiche = threading.Lock()  #Protegge le statistiche aggiornate dai thread
+
+    def __getstate__(self):
+        #Manifest, cache, diario (connessioni SQLite), limitatori e lock non possono essere serializzati con pickle
+        stato = self.__dict__.copy()
+        stato["manifest"] = None
+        stato["manifest_attivo"] = False
+        stato["cache_hash"] = None
+        stato["diario"] = None
+        stato["limite_byte"] = None
+        stato["limite_operazioni"] = None
+        stato["lock_statistiche"] = None
+        stato["metriche"] = None
+        return stato
+
+    def __setstate__(self, stato):
+        self.__dict__.update(stato)
+        self.lock_statistiche = threading.Lock()
+        self.metriche = Metriche()
+        self._crea_limitatori()
+
+    def _crea_limitatori(self):
+        #Secchi di gettoni condivisi da tutti i worker (None se il limite non è impostato)
+        self.limite_byte = SecchioGettoni(self.max_bytes_per_second) if self.max_bytes_per_second is not None else None
+        self.limite_operazioni = SecchioGettoni(self.max_ops_per_second) if self.max_ops_per_second is not None else None
+
+    def _limita_byte(self, byte):
+        #Attende che il limite di banda consenta di trasferire "byte" byte (passato a "copia_contenuto")
+        self.metriche.limitazione("byte", self.limite_byte.attendi(byte))
+
+    def _limita_operazione(self):
+        #Attende che il limite di operazioni al secondo consenta un'altra operazione
+        if self.limite_operazioni is not None:
+            self.metriche.limitazione("operazioni", self.limite_operazioni.attendi())
+
+# ==================== MANIFEST DESTINAZIONE ======================
+
+    def apri_manifest(self):
+        """
+        Metodo che apre il manifest della destinazione, se richiesto con "use_manifest".
+        Il manifest viene usato al posto della lettura della destinazione solo se descrive già l'intera
+        destinazione; altrimenti viene ricostruito durante la scansione completa.
+        """
+        if not self.use_manifest or self.manifest is not None:
+            return
+
+        percorso = os.path.join(self.destination, CARTELLA_METADATI, "manifest.sqlite")
+
+        try:
+            self.manifest = Manifest(percorso)
+            self.manifest_attivo = self.manifest.completo
+            #Fino alla chiusura regolare il manifest non è completo: le registrazioni vengono confermate a blocchi,
+            #quindi un'interruzione può perderne alcune e la sincronizzazione successiva deve rileggere la destinazione
+            self.manifest.segna_completo(False)
+
+        except sqlite3.Error as e:  #Un manifest danneggiato viene scartato e ricostruito
+            self.errors.append(f"\nManifest non leggibile, verrà ricostruito: {str(e)}")
+            os.remove(percorso)
+            self.manifest = Manifest(percorso)
+            self.manifest_attivo = False
+
+    def chiudi_manifest(self, completo=False):
+        """
+        Metodo che chiude il manifest della destinazione.
+
+        Argomenti in ingresso:
+            completo: True se è appena terminata una sincronizzazione dell'intero albero
+        """
+        if self.manifest is None:
+            return
+
+        if completo:
+            self.manifest.segna_completo()
+
+        self.manifest.chiudi()
+        self.manifest = None
+        self.manifest_attivo = False
+
+    def _rel_destinazione(self, dst_path):
+        #Percorso relativo alla destinazione, usato come chiave nel manifest
+        return os.path.relpath(dst_path, self.destination)
+
+# ==================== DIARIO E RIPRESA ======================
+
+    def apri_diario(self):
+        """
+        Metodo che apre il diario della sincronizzazione, se richiesto con "resume", e sceglie da dove partire:
+        se il diario contiene il piano completo di una sincronizzazione interrotta con la stessa configurazione,
+        vengono eseguite solo le azioni rimaste; altrimenti la scansione completa, registrando ogni azione.
+        Viene utilizzato nel metodo "sync".
+
+        Returns:
+            Generatore di oggetti Azione da eseguire
+        """
+        if not self.resume:
+            return self._scansiona()
+
+        percorso = os.path.join(self.destination, CARTELLA_METADATI, "journal.sqlite")
+        configurazione = f"{self.source}|{self.compare_mode}|{self.hash_algorithm}"
+
+        try:
+            self.diario = Diario(percorso, self.checkpoint_interval)
+            riprendi = self.diario.riprendibile(configurazione)
+
+        except sqlite3.Error as e:  #Un diario danneggiato viene scartato: si riparte dalla scansione completa
+            self.errors.append(f"\nDiario non leggibile, la sincronizzazione ripartirà da capo: {str(e)}")
+            os.remove(percorso)
+            self.diario = Diario(percorso, self.checkpoint_interval)
+            riprendi = False
+
+        if riprendi:
+            totali, fatti = self.diario.conta()
+            print(f"\nRipresa della sincronizzazione interrotta: {totali - fatti} azioni rimaste su {totali}")
+
+            if not self.manifest_attivo:
+                #Senza scansione un manifest incompleto non verrebbe completato: verrà ricostruito alla prossima
+                self.chiudi_manifest()
+
+            return self._azioni_in_sospeso()
+
+        self.diario.inizia(configurazione)
+        return self._scansiona_con_diario()
+
+    def chiudi_diario(self, completato=False):
+        """
+        Metodo che salva e chiude il diario della sincronizzazione.
+
+        Argomenti in ingresso:
+            completato: True se la sincronizzazione è terminata e non resta nulla da riprendere (il diario viene eliminato)
+        """
+        if self.diario is None:
+            return
+
+        self.diario.chiudi(elimina=completato)
+        self.diario = None
+
+    def _scansiona_con_diario(self):
+        #Scansione completa che registra nel diario ogni azione prima di passarla alla pipeline
+        for azione in self._scansiona():
+            self.diario.registra(azione)
+            yield azione
+
+        self.diario.fine_scansione()  #Raggiunto solo se la scansione non è stata interrotta
+
+    def _azioni_in_sospeso(self):
+        #Ricostruisce le azioni non completate dal diario; le sorgenti nel frattempo scomparse vengono segnalate
+        for tipo, src, dst in self.diario.in_sospeso():
+            stat_src = None
+
+            if tipo in ("copia", "aggiorna"):
+                try:
+                    stat_src = os.stat(src)
+                except OSError as e:
+                    self.errors.append(f"\nErrore riprendendo la copia di {Path(src).name}: {str(e)}")
+                    continue
+
+            yield Azione(tipo, src, dst, stat_src, None)
+
+    def _verificato(self, dst_file):
+        #Una coppia risultata identica alla verifica è un'azione del piano completata
+        if self.diario is not None:
+            self.diario.completa(dst_file)
+
+# ==================== CACHE HASH ======================
+
+    def apri_cache_hash(self):
+        """
+        Metodo che apre la cache persistente degli hash, se richiesta con "hash_cache".
+        """
+        if not self.hash_cache or self.cache_hash is not None:
+            return
+
+        if self.hash_cache is True:
+            percorso = os.path.join(self.destination, CARTELLA_METADATI, "hash_cache.sqlite")
+        else:
+            percorso = str(self.hash_cache)
+
+        try:
+            self.cache_hash = CacheHash(percorso, self.hash_cache_size, self.hash_algorithm)
+
+        except sqlite3.Error as e:  #Una cache danneggiata viene semplicemente ricreata
+            self.errors.append(f"\nCache degli hash non leggibile, verrà ricreata: {str(e)}")
+            os.remove(percorso)
+            self.cache_hash = CacheHash(percorso, self.hash_cache_size, self.hash_algorithm)
+
+    def chiudi_cache_hash(self):
+        """
+        Metodo che salva e chiude la cache persistente degli hash.
+        """
+        if self.cache_hash is not None:
+            self.cache_hash.chiudi()
+            self.cache_hash = None
+
+# ==================== CALCOLO HASH ======================
+
+    def calcola_hash(self, filepath):
+        """
+        Metodo che calcola l'hash di un file con l'algoritmo "hash_algorithm" (operazione CPU-intensive).
+        Se la cache degli hash è aperta, viene consultata prima di leggere il file.
+
+        Argomenti in ingresso:
+            filepath: Percorso del generico file
+
+        Returns:
+            Tupla (filepath, hash_string, success)
+        """
+        try:
+            stat = None
+
+            if self.cache_hash is not None:  #Se il file non è cambiato dall'ultima volta, l'hash è già noto
+                stat = os.stat(filepath)
+                hash_value = self.cache_hash.cerca(stat)
+                if hash_value is not None:
+                    return filepath, hash_value, True
+
+            hash_value = hash_file(filepath, self.hash_algorithm)
+
+            if stat is not None:
+                self.cache_hash.memorizza(stat, hash_value)
+
+            return filepath, hash_value, True  #Restituisce il percorso del file e l'hash in formato esadecimale più il boolean True in "success"
+
+        except Exception as e:
+            return filepath, None, False  #Restituisce la tupla con il percorso, senza l'hash ed il boolean False in "success"
+
+    def _elabora_a_lotti(self, coppie, funzione, peso, usa_processi, lavoratori, fase="hash"):
+        """
+        Generatore che costituisce la pipeline di confronto: raggruppa le coppie in lotti bilanciati per byte
+        da leggere, li invia ai worker e restituisce i risultati man mano che arrivano.
+        I lotti in lavorazione sono al massimo il doppio dei worker, quindi la memoria occupata
+        non dipende dal numero di file.
+
+        Argomenti in ingresso:
+            coppie: Iterabile (anche generatore) di CoppiaHash
+            funzione: Funzione di modulo che calcola il valore di un file (deve poter essere inviata ai processi)
+            peso: Funzione che restituisce i byte da leggere per una coppia
+            usa_processi: True per usare un ProcessPoolExecutor, False per i thread
+            lavoratori: Numero di worker
+            fase: Nome della fase in cui registrare le metriche ("hash" oppure "impronta")
+
+        Yields:
+            Tuple (coppia, valore_src, valore_dst)
+        """
+        Executor = ProcessPoolExecutor if usa_processi else ThreadPoolExecutor
+        in_corso = set()  #Future dei lotti in lavorazione
+        dati_lotti = {}  #Future -> (file, byte) del lotto, per le metriche
+
+        def completato(future):
+            #Il tempo registrato è quello misurato dal worker, senza l'attesa in coda e quella del consumatore
+            file, byte = dati_lotti.pop(future)
+            inizio, fine, risultati = future.result()
+            self.metriche.registra(fase, inizio, file, byte, fine)
+            return risultati
+
+        with Executor(max_workers=lavoratori) as executor:
+
+            lotto = []
+            byte_lotto = 0
+
+            for coppia in chain(coppie, [None]):  #None segnala la fine delle coppie e chiude l'ultimo lotto
+
+                if coppia is not None:
+                    lotto.append(coppia)
+                    byte_lotto += peso(coppia)
+
+                    if byte_lotto < self.hash_batch_bytes and len(lotto) < self.hash_batch_files:
+                        continue  #Il lotto non è ancora completo
+
+                if not lotto:
+                    continue
+
+                while len(in_corso) >= lavoratori * 2:  #Coda piena: prima si raccolgono i risultati pronti
+                    completati, in_corso = wait(in_corso, return_when=FIRST_COMPLETED)
+                    for future in completati:
+                        yield from completato(future)
+
+                future = executor.submit(elabora_lotto, lotto, funzione)
+                dati_lotti[future] = (len(lotto), byte_lotto)
+                in_corso.add(future)
+                lotto = []
+                byte_lotto = 0
+
+            for future in as_completed(in_corso):
+                yield from completato(future)
+
+# ==================== COPIA FILE ======================
+
+    def copia_file(self, src_file, dst_file):
+        """
+        Metodo che copia un singolo file (operazione I/O-intensive).
+        Verrà utilizzato con threading nel metodo "sync" alla fase 2.
+
+        Argomenti in ingresso:
+            src_file: Percorso file sorgente
+            dst_file: Percorso file destinazione
+
+        Returns:
+            Tupla (success, message)
+        """
+
+        #Estrazione della (sotto)cartella che contiene il file dal percorso completo
+        dst_folder = os.path.dirname(dst_file)
+        inizio = time.monotonic()
+
+        try:
+            self._limita_operazione()
+
+            #Verifica l'esistenza della cartella nella destinazione e la crea se non esiste
+            #(exist_ok perché più thread possono copiare file nella stessa cartella nuova)
+            if not os.path.exists(dst_folder):
+                os.makedirs(dst_folder, exist_ok=True)
+                self.metriche.conta("mkdir")
+            else:
+                self._pulisci_temporanei(dst_folder)
+
+            dimensione = os.path.getsize(src_file)
+
+            #I file grandi già presenti nella destinazione vengono aggiornati riscrivendo solo i blocchi modificati
+            if self.delta_threshold is not None and dimensione >= self.delta_threshold and os.path.isfile(dst_file):
+                riscritti, totale = self.copia_delta(src_file, dst_file)
+                dimensione = riscritti
+                strategia = "delta"
+                message = f"\nAggiornato (delta): {Path(src_file).name}, riscritti {riscritti / 1024 ** 2:.1f} MB su {totale / 1024 ** 2:.1f} MB"
+
+            else:
+                #Copia il contenuto con la strategia più efficiente disponibile, poi i metadati come shutil.copy2,
+                #in un file temporaneo rinominato sul file finale solo a copia completata: un'interruzione
+                #non lascia mai un file troncato con una data di modifica recente
+                temporaneo = self._percorso_temporaneo(dst_file)
+
+                try:
+                    strategia = copia_contenuto(src_file, temporaneo, self.copy_buffer_size, self.use_reflink,
+                                                self._limita_byte if self.limite_byte is not None else None)
+                    shutil.copystat(src_file, temporaneo)
+                    os.replace(temporaneo, dst_file)
+                except BaseException:
+                    self._rimuovi_temporaneo(temporaneo)
+                    raise
+
+                message = f"\nCopiato ({strategia}): {Path(src_file).name}"
+
+            with self.lock_statistiche:
+                self.strategie_copia[strategia] += 1
+
+            self.metriche.conta(strategia)
+            self.metriche.registra("copia", inizio, byte=dimensione)
+
+            if self.manifest is not None:  #Registra la copia riuscita nel manifest
+                self.manifest.registra(self._rel_destinazione(dst_file), os.stat(dst_file))
+
+            return True, message  #Restituisce un True ed un messaggio di operazione andata a buon fine
+
+        except Exception as e:
+            return False, f"\nErrore copiando {Path(src_file).name}: {str(e)}"  #Restituisce un False e relativo messaggio
+
+    def _percorso_temporaneo(self, dst_file):
+        #File temporaneo nascosto, nella stessa cartella del file finale (os.replace è atomico solo sullo stesso filesystem)
+        cartella, nome = os.path.split(dst_file)
+        suffisso = f".{self.id_esecuzione}-{next(self.copie_avviate):x}{SUFFISSO_TEMPORANEO}"
+        #Il nome viene accorciato in byte, non in caratteri, perché il limite del filesystem è in byte
+        nome = os.fsdecode(os.fsencode(nome)[:LUNGHEZZA_MAX_NOME - 1 - len(os.fsencode(suffisso))])
+        return os.path.join(cartella, f".{nome}{suffisso}")
+
+    def _pulisci_temporanei(self, cartella):
+        """
+        Metodo che elimina i file temporanei lasciati da copie interrotte in una cartella della destinazione,
+        la prima volta che in questa esecuzione vi si copia un file. Serve quando la destinazione non viene
+        riletta dal disco (manifest in uso o ripresa dal diario): la scansione completa li elimina già da sola.
+        Una copia interrotta non ha aggiornato il file finale, quindi la sua cartella riceverà di nuovo una copia.
+
+        Argomenti in ingresso:
+            cartella: Percorso della cartella della destinazione
+        """
+        if not self.manifest_attivo and self.diario is None:
+            return
+
+        with self.lock_statistiche:
+            if cartella in self.cartelle_pulite:
+                return
+            self.cartelle_pulite.add(cartella)
+
+        try:
+            self.metriche.conta("scandir")
+            with os.scandir(cartella) as voci:
+                orfani = [voce.name for voce in voci if self._temporaneo_orfano(voce.name)]
+        except OSError:
+            return
+
+        if not orfani:
+            return
+
+        #Un file con lo stesso nome di un temporaneo può essere un file sincronizzato: si eliminano solo
+        #i nomi che non esistono nella sorgente e che il manifest non registra
+        rel_cartella = self._rel_destinazione(cartella)
+        if rel_cartella == os.curdir:
+            rel_cartella = ""
+        registrati = self.manifest.elenca(rel_cartella) if self.manifest_attivo else None
+        registrati = registrati[0] if registrati is not None else {}
+
+        for nome in orfani:
+            if nome in registrati or os.path.lexists(os.path.join(self.source, rel_cartella, nome)):
+                continue
+
+            self.metriche.conta("unlink")
+            self._rimuovi_temporaneo(os.path.join(cartella, nome))
+
+    def _temporaneo_orfano(self, nome):
+        #True se il nome è quello di un temporaneo lasciato da un'altra esecuzione (copia interrotta)
+        corrispondenza = MODELLO_TEMPORANEO.match(nome)
+        return corrispondenza is not None and corrispondenza.group(1) != self.id_esecuzione
+
+    @staticmethod
+    def _rimuovi_temporaneo(temporaneo):
+        #Elimina il file temporaneo di una copia fallita, se è stato creato
+        try:
+            os.remove(temporaneo)
+        except OSError:
+            pass
+
+    def copia_delta(self, src_file, dst_file):
+        """
+        Metodo che aggiorna un file già presente nella destinazione riscrivendo solo i blocchi diversi.
+        I blocchi di "delta_block_size" byte vengono confrontati alla stessa posizione nei due file,
+        quindi le modifiche in place e le aggiunte in coda (il caso tipico di dump e immagini disco)
+        producono scritture proporzionali ai soli dati cambiati.
+        Viene utilizzato dal metodo "copia_file".
+
+        Argomenti in ingresso:
+            src_file: Percorso file sorgente
+            dst_file: Percorso file destinazione, già esistente
+
+        Returns:
+            Tupla (byte_riscritti, byte_totali)
+        """
+        blocco = self.delta_block_size
+        riscritti = 0
+        posizione = 0
+
+        #Finché l'aggiornamento non è completo il file viene marcato come vecchio (mtime a zero):
+        #se il processo si interrompe, la sincronizzazione successiva lo considererà da copiare
+        os.utime(dst_file, ns=(0, 0))
+
+        with open(src_file, "rb") as fs, open(dst_file, "r+b") as fd:
+
+            while True:
+                dati = fs.read(blocco)  #Blocco della sorgente
+                if not dati:
+                    break
+
+                if fd.read(len(dati)) != dati:  #Confronto con il blocco nella stessa posizione della destinazione
+                    fd.seek(posizione)
+                    fd.write(dati)
+                    riscritti += len(dati)
+
+                if self.limite_byte is not None:  #Il limite di banda conta i byte letti dalla sorgente
+                    self._limita_byte(len(dati))
+
+                posizione += len(dati)
+
+            fd.truncate(posizione)  #Se il file sorgente si è accorciato, la coda in eccesso viene eliminata
+
+        shutil.copystat(src_file, dst_file)  #Copia i metadati come shutil.copy2
+
+        return riscritti, posizione
+
+    def crea_pianificatore(self, max_in_coda=None, esegui=None):
+        """
+        Metodo che crea il pianificatore delle copie configurato con i parametri del sincronizzatore.
+        I lavori da accodare sono tuple ("copia", src_file, dst_file), eseguite con "copia_file",
+        oppure ("elimina", dst_file) e ("elimina_cartella", dst_folder), eseguite con "elimina_file" ed "elimina_cartella"
+        (con dimensione 0, nella corsia dei file piccoli: i sottoalberi vengono eliminati in parallelo).
+
+        Con "autotune" ogni corsia avvia fino ad "autotune_max_workers" thread e la concorrenza
+        viene regolata durante l'esecuzione da un AutoregolatoreConcorrenza.
+
+        Argomenti in ingresso:
+            max_in_coda: Numero massimo di copie in attesa (None: nessun limite)
+            esegui: Funzione che esegue i lavori (default: "_esegui_lavoro")
+
+        Returns:
+            Oggetto PianificatoreCopie già avviato
+        """
+        return PianificatoreCopie(esegui or self._esegui_lavoro, self.small_file_threshold,
+                                  self.small_file_workers, self.large_file_workers, self.max_bytes_in_flight,
+                                  max_in_coda, self.metriche,
+                                  self.autotune_max_workers if self.autotune else None,
+                                  self.autotune_interval if self.autotune else None)
+
+    def _esegui_lavoro(self, lavoro):
+        #Esegue un lavoro del pianificatore in base al suo tipo
+        if lavoro[0] == "copia":
+            return self.copia_file(lavoro[1], lavoro[2])
+        if lavoro[0] == "elimina_cartella":
+            return self.elimina_cartella(lavoro[1])
+        return self.elimina_file(lavoro[1])
+
+# ==================== ELIMINA FILE ======================
+
+    def elimina_file(self, file_path):
+        """
+        Metodo che elimina un singolo file.
+        Verrà utilizzato con threading nel metodo "sync" alla fase 3.
+
+        Argomenti in ingresso:
+            file_path: Percorso del file da eliminare
+
+        Returns:
+            Tupla (success, message)
+        """
+        inizio = time.monotonic()
+
+        try:  #Elimina file e restituisce il True in "success" con relativo messaggio
+            try:
+                self._limita_operazione()
+                self.metriche.conta("unlink")
+                os.remove(file_path)
+
+            except FileNotFoundError:
+                #Con il manifest o con il diario il file può essere già stato eliminato da una sincronizzazione interrotta
+                if not self.manifest_attivo and self.diario is None:
+                    raise
+
+            if self.manifest is not None:  #Registra l'eliminazione nel manifest
+                self.manifest.rimuovi(self._rel_destinazione(file_path))
+
+            self.metriche.registra("eliminazione", inizio)
+
+            return True, f"\nEliminato: {Path(file_path).name}"
+
+        except Exception as e:  #In caso di eccezione restituisce il False in "success" con relativo messaggio
+
+            return False, f"\nErrore eliminando {Path(file_path).name}: {str(e)}"
+
+    def elimina_cartella(self, folder_path):
+        """
+        Metodo che elimina un'intera cartella della destinazione, con tutto il suo contenuto, tramite shutil.rmtree.
+        Viene utilizzato per i sottoalberi che non esistono più nella sorgente: un solo lavoro per sottoalbero
+        invece di uno per file, e nessuna cartella vuota lasciata nella destinazione.
+
+        Argomenti in ingresso:
+            folder_path: Percorso della cartella da eliminare
+
+        Returns:
+            Tupla (success, message)
+        """
+        inizio = time.monotonic()
+
+        try:
+            try:
+                self.metriche.conta("rmtree")
+                if self.limite_operazioni is None:
+                    shutil.rmtree(folder_path)
+                else:
+                    self._elimina_albero_limitato(folder_path)
+
+            except FileNotFoundError:
+                if not self.manifest_attivo and self.diario is None:  #Con il manifest o il diario la cartella può essere già stata eliminata
+                    raise
+
+            if self.manifest is not None:  #Registra l'eliminazione dell'intero sottoalbero nel manifest
+                self.manifest.rimuovi_cartella(self._rel_destinazione(folder_path))
+
+            self.metriche.registra("eliminazione", inizio)
+
+            return True, f"\nEliminata cartella: {Path(folder_path).name}"
+
+        except Exception as e:
+            return False, f"\nErrore eliminando la cartella {Path(folder_path).name}: {str(e)}"
+
+    def _elimina_albero_limitato(self, folder_path):
+        """
+        Metodo che elimina un sottoalbero come shutil.rmtree, ma prelevando un'operazione dal limite
+        "max_ops_per_second" per ogni file e cartella eliminati. Viene utilizzato da "elimina_cartella".
+
+        Argomenti in ingresso:
+            folder_path: Percorso della cartella da eliminare
+        """
+        #Dal basso verso l'alto: quando si arriva ad una cartella le sue sottocartelle sono già vuote
+        for radice, cartelle, files in os.walk(folder_path, topdown=False):
+            for nome in files:
+                self._limita_operazione()
+                os.remove(os.path.join(radice, nome))
+
+            for nome in cartelle:
+                percorso = os.path.join(radice, nome)
+                self._limita_operazione()
+                if os.path.islink(percorso):  #Un collegamento simbolico ad una cartella si elimina senza seguirlo
+                    os.remove(percorso)
+                else:
+                    os.rmdir(percorso)
+
+        self._limita_operazione()
+        os.rmdir(folder_path)  #Solleva FileNotFoundError se la cartella non esiste, come shutil.rmtree
+
+# ==================== MOTORE DI CONFRONTO ======================
+
+    def _elenca_cartella(self, percorso):
+        """
+        Metodo che legge il contenuto di una cartella con una sola chiamata a os.scandir.
+        Viene utilizzato dal motore di confronto nel metodo "_confronta_cartella".
+
+        Argomenti in ingresso:
+            percorso: Percorso della cartella da leggere
+
+        Returns:
+            Tupla (files, cartelle) con il dizionario {nome: stat} dei file e l'insieme dei nomi delle sottocartelle,
+            oppure None se la cartella non esiste
+        """
+        files = {}  #Dizionario nome -> risultato di stat() dei file contenuti nella cartella
+        cartelle = set()  #Insieme dei nomi delle sottocartelle
+
+        try:
+            with os.scandir(percorso) as voci:  #Una sola lettura della cartella, il tipo di ogni voce arriva già dal sistema operativo
+                for voce in voci:
+
+                    #I collegamenti simbolici a cartelle vengono ignorati, come faceva os.walk
+                    if voce.is_dir(follow_symlinks=False):
+                        cartelle.add(voce.name)
+
+                    elif voce.is_file():
+                        #Il risultato di stat() viene memorizzato dalla voce: ogni file viene interrogato una sola volta
+                        files[voce.name] = voce.stat()
+
+        except (FileNotFoundError, NotADirectoryError):
+            return None  #La cartella non esiste su questo lato
+
+        finally:
+            self.metriche.conta("scandir")
+
+        self.metriche.conta("stat", len(files))
+
+        return files, cartelle
+
+    def _elenca_destinazione(self, cartella_dst, rel_path):
+        """
+        Metodo che legge il contenuto di una cartella della destinazione, dal disco oppure dal manifest.
+        Con "validate_manifest" ogni file registrato viene controllato con uno stat(), senza rileggere la cartella.
+
+        Argomenti in ingresso:
+            cartella_dst: Percorso della cartella nella destinazione
+            rel_path: Percorso della cartella relativo alla destinazione
+
+        Returns:
+            Stesso formato di "_elenca_cartella"
+        """
+        if not self.manifest_attivo:
+            return self._elenca_cartella(cartella_dst)
+
+        elenco = self.manifest.elenca(rel_path)
+
+        if elenco is not None and self.validate_manifest:
+            files, cartelle = elenco
+
+            self.metriche.conta("stat", len(files))
+
+            for nome, voce in list(files.items()):
+                try:
+                    stat = os.stat(os.path.join(cartella_dst, nome))
+                except FileNotFoundError:
+                    del files[nome]  #Il file non esiste più: verrà copiato di nuovo
+                    continue
+
+                if (stat.st_size, stat.st_mtime_ns, stat.st_ino) != (voce.st_size, voce.st_mtime_ns, voce.st_ino):
+                    files[nome] = stat  #Il file è stato modificato fuori dal sincronizzatore: si usa lo stato reale
+
+        return elenco
+
+    def _confronta_cartella(self, rel_path, in_sorgente, in_destinazione):
+        """
+        Metodo che confronta una cartella della sorgente con l'analoga cartella della destinazione.
+        Viene eseguito in parallelo dal motore di confronto "_scansiona", una cartella per task.
+
+        Argomenti in ingresso:
+            rel_path: Percorso della cartella relativo a "source" e "destination" ("" per la radice)
+            in_sorgente: False se è già noto che la cartella non esiste nella sorgente
+            in_destinazione: False se è già noto che la cartella non esiste nella destinazione
+
+        Returns:
+            Tupla (azioni, sottocartelle) con la lista di Azione della cartella e la lista delle
+            sottocartelle da confrontare come tuple (rel_path, in_sorgente, in_destinazione)
+        """
+        cartella_src = os.path.join(self.source, rel_path)
+        cartella_dst = os.path.join(self.destination, rel_path)
+        inizio = time.monotonic()
+
+        try:
+            elenco_src = self._elenca_cartella(cartella_src) if in_sorgente else None
+            elenco_dst = self._elenca_destinazione(cartella_dst, rel_path) if in_destinazione else None
+
+        except OSError as e:
+            #Se una cartella non è leggibile non si decide nulla sul suo contenuto, per non eliminare file per errore
+            self.errors.append(f"\nErrore leggendo la cartella {rel_path or '.'}: {str(e)}")
+            self.scansione_incompleta = True
+            return [], []
+
+        self.metriche.registra("scansione", inizio, file=len(elenco_src[0]) if elenco_src is not None else 0)
+
+        return self._confronta_elenchi(rel_path, in_sorgente, elenco_src, elenco_dst)
+
+    def _confronta_elenchi(self, rel_path, in_sorgente, elenco_src, elenco_dst):
+        """
+        Metodo che confronta il contenuto, già letto, di una cartella della sorgente e della destinazione.
+        Viene utilizzato da "_confronta_cartella" e da "sync_async".
+
+        Argomenti in ingresso:
+            rel_path: Percorso della cartella relativo a "source" e "destination" ("" per la radice)
+            in_sorgente: False se è già noto che la cartella non esiste nella sorgente
+            elenco_src, elenco_dst: Contenuto delle due cartelle, nel formato di "_elenca_cartella"
+
+        Returns:
+            Stesso formato di "_confronta_cartella"
+        """
+        cartella_src = os.path.join(self.source, rel_path)
+        cartella_dst = os.path.join(self.destination, rel_path)
+
+        if elenco_src is None and not rel_path and in_sorgente:
+            #Una sorgente inesistente porterebbe ad eliminare l'intera destinazione
+            self.errors.append(f"\nCartella sorgente inesistente: {self.source}")
+            self.scansione_incompleta = True
+            return [], []
+
+        files_src, cartelle_src = elenco_src if elenco_src is not None else ({}, set())
+        files_dst, cartelle_dst = elenco_dst if elenco_dst is not None else ({}, set())
+
+        if not rel_path:  #La cartella dei metadati non fa parte dei dati da sincronizzare
+            cartelle_src.discard(CARTELLA_METADATI)
+            cartelle_dst.discard(CARTELLA_METADATI)
+
+        azioni = []  #Inizializza la lista delle azioni relative a questa cartella
+        #Le cartelle mancanti nella destinazione non vengono create qui: le crea "copia_file" solo se vi copia un file
+
+        for nome, stat_src in files_src.items():
+            src_file = os.path.join(cartella_src, nome)
+            dst_file = os.path.join(cartella_dst, nome)
+            stat_dst = files_dst.get(nome)
+
+            azione = self._confronta_file(src_file, dst_file, stat_src, stat_dst)
+            if azione is not None:
+                azioni.append(azione)
+
+            if stat_dst is not None and self.manifest is not None and not self.manifest_attivo:
+                #Durante la scansione completa il manifest viene popolato con i file già presenti
+                self.manifest.registra(os.path.join(rel_path, nome), stat_dst)
+
+        for nome, stat_dst in files_dst.items():
+            if MODELLO_TEMPORANEO.match(nome) and not self._temporaneo_orfano(nome):
+                continue  #Copia in corso di questa esecuzione (i temporanei di copie interrotte vengono eliminati)
+
+            if nome not in files_src and nome not in cartelle_src:  #Il file non esiste più nella sorgente
+                azioni.append(Azione("elimina", None, os.path.join(cartella_dst, nome), None, stat_dst))
+
+        #Le sottocartelle presenti solo nella destinazione vengono eliminate per intero, senza visitarle file per file
+        for nome in cartelle_dst - cartelle_src:
+            if nome not in files_src:
+                azioni.append(Azione("elimina_cartella", None, os.path.join(cartella_dst, nome), None, None))
+
+        sottocartelle = [(os.path.join(rel_path, nome), True, nome in cartelle_dst) for nome in cartelle_src]
+
+        return azioni, sottocartelle
+
+    def _confronta_file(self, src_file, dst_file, stat_src, stat_dst):
+        """
+        Metodo che decide l'azione per un file presente nella sorgente.
+        Viene utilizzato da "_confronta_cartella" e dal metodo "watch".
+
+        Argomenti in ingresso:
+            src_file, dst_file: Percorsi del file nella sorgente e nella destinazione
+            stat_src, stat_dst: Risultati di stat() dei due file (stat_dst None se il file non esiste nella destinazione)
+
+        Returns:
+            Oggetto Azione, oppure None se il file è già sincronizzato
+        """
+        if stat_dst is None:
+            return Azione("copia", src_file, dst_file, stat_src, None)  #File non esiste nella destinazione
+
+        if self.compare_mode != "mtime" and stat_src.st_size != stat_dst.st_size:
+            return Azione("aggiorna", src_file, dst_file, stat_src, stat_dst)  #Dimensioni diverse: nessun hash necessario
+
+        if self.compare_mode != "mtime":
+            return Azione("verifica", src_file, dst_file, stat_src, stat_dst)  #Sarà confrontato tramite hash o impronta
+
+        if stat_src.st_mtime_ns > stat_dst.st_mtime_ns:
+            return Azione("aggiorna", src_file, dst_file, stat_src, stat_dst)  #Controllo semplice: data di modifica
+
+        return None
+
+    def _scansiona(self, rel_path=""):
+        """
+        Generatore che scansiona sorgente e destinazione in un'unica passata, in parallelo, usando os.scandir.
+        Ogni cartella viene letta una sola volta per lato ed ogni file viene interrogato con un solo stat(),
+        al posto delle due visite con os.walk e delle chiamate os.path.exists/os.path.getmtime per ogni file.
+
+        Argomenti in ingresso:
+            rel_path: Sottocartella da cui partire, relativa a "source" ("" per l'intero albero)
+
+        Yields:
+            Oggetti Azione, nell'ordine in cui le cartelle vengono completate
+        """
+        in_attesa = deque([(rel_path, True, True)])  #Cartelle ancora da confrontare
+        in_corso = set()  #Future delle cartelle in fase di lettura
+        massimo_in_corso = self.workers * 2  #Limita le cartelle lette contemporaneamente
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+
+            while in_attesa or in_corso:
+
+                while in_attesa and len(in_corso) < massimo_in_corso:
+                    in_corso.add(executor.submit(self._confronta_cartella, *in_attesa.popleft()))
+
+                completati, in_corso = wait(in_corso, return_when=FIRST_COMPLETED)  #Attende almeno una cartella completata
+
+                for future in completati:
+                    azioni, sottocartelle = future.result()
+                    in_attesa.extend(sottocartelle)  #Le sottocartelle trovate vengono accodate
+
+                    for azione in azioni:
+                        yield azione
+
+    def calcola_piano(self):
+        """
+        Metodo che esegue il motore di confronto e raccoglie il piano completo della sincronizzazione.
+        Viene utilizzato nel metodo "sync" alla fase 1.
+
+        Returns:
+            Dizionario {tipo: lista di Azione} con i tipi "copia", "aggiorna", "verifica", "elimina", "elimina_cartella"
+        """
+        if not self.quiet:
+            print("\nScansione cartelle in corso...")
+
+        piano = {"copia": [], "aggiorna": [], "verifica": [], "elimina": [], "elimina_cartella": []}
+
+        for azione in self._scansiona():
+            piano[azione.tipo].append(azione)
+
+        return piano
+
+# ==================== TROVA FILE ======================
+
+    def trova_file_da_sincronizzare(self):
+        """
+        Metodo che scansiona le cartelle e identifica quali file devono essere copiati.
+        Le cartelle mancanti nella destinazione vengono create al momento della copia.
+
+        Returns:
+            Lista di tuple (src_file, dst_file) dei file da copiare (in modalità hash anche quelli da verificare)
+        """
+        files_da_copiare = []  #Inizializza la lista da riempire con le tuple
+
+        for tipo, azioni in self.calcola_piano().items():
+            if tipo not in ("elimina", "elimina_cartella"):
+                for azione in azioni:
+                    files_da_copiare.append((azione.src, azione.dst))
+
+        return files_da_copiare  #Restituisce la lista di tuple relative ai file da copiare
+
+# ==================== IMPRONTA A CAMPIONE ======================
+
+    def calcola_impronta(self, filepath):
+        """
+        Metodo che calcola un'impronta a campione di un file: dimensione, primo ed ultimo blocco
+        e "sample_blocks" blocchi equidistanti, con l'algoritmo "hash_algorithm".
+        Legge solo una piccola parte dei file grandi; i file piccoli vengono letti per intero.
+
+        Argomenti in ingresso:
+            filepath: Percorso del generico file
+
+        Returns:
+            Tupla (filepath, impronta, success)
+        """
+        try:
+            return filepath, impronta_file(filepath, self.hash_algorithm, self.sample_blocks, self.sample_block_size), True
+
+        except Exception:
+            return filepath, None, False
+
+    def verifica_con_impronta(self, files_da_verificare):
+        """
+        Metodo che verifica l'uguaglianza dei file confrontandone l'impronta a campione (usa threading).
+        Con "sample_escalate" le coppie con impronte uguali ma date di modifica diverse vengono
+        verificate con l'hash completo.
+
+        Args:
+            files_da_verificare: Lista di tuple (src_file, dst_file)
+
+        Returns:
+            Lista di tuple (src_file, dst_file) dei file che sono diversi
+        """
+        if not files_da_verificare:
+            return []
+
+        print(f"\nCalcolo impronte a campione per {len(files_da_verificare)} file...")
+
+        files_diversi = [(src, dst) for src, dst, dimensione in self._flusso_impronte(files_da_verificare)]
+
+        print(f"\n{len(files_diversi)} file necessitano aggiornamento")
+
+        return files_diversi
+
+    def _flusso_impronte(self, files_da_verificare):
+        """
+        Generatore che confronta le impronte a campione delle coppie man mano che arrivano.
+        Viene utilizzato nel metodo "sync" in modalità "sample".
+        Le coppie da approfondire passano attraverso una coda limitata ad un thread che le verifica con l'hash completo
+        ("_flusso_hash") mentre il confronto delle impronte prosegue: la memoria resta limitata e le copie non attendono la fine.
+
+        Argomenti in ingresso:
+            files_da_verificare: Iterabile (anche una coda) di tuple (src_file, dst_file)
+
+        Yields:
+            Tuple (src_file, dst_file, dimensione) dei file che sono diversi
+        """
+        diversi = deque()  #File sicuramente diversi (dimensioni diverse oppure non leggibili), riempita da "_prepara_coppie"
+        da_approfondire = queue.Queue(maxsize=self.pipeline_queue_size)  #File con impronte uguali ma date di modifica diverse
+        approfonditi = queue.Queue()  #Risultati dell'hash completo: al massimo le coppie della coda precedente più i lotti in corso
+        approfondimento = None  #Thread dell'hash completo, avviato alla prima coppia da approfondire
+        approfondite = 0
+
+        def approfondisci():
+            terminata = threading.Event()
+            try:
+                for risultato in self._flusso_hash(self._leggi_coda(da_approfondire, terminata)):
+                    approfonditi.put(risultato)
+            except Exception as e:
+                self.errors.append(f"\nErrore durante la verifica con hash completo: {str(e)}")
+                self._svuota(da_approfondire, terminata)
+            finally:
+                approfonditi.put(self.FINE)
+
+        def pronti():  #Risultati dell'hash completo già disponibili, senza attenderne altri
+            while True:
+                try:
+                    yield approfonditi.get_nowait()
+                except queue.Empty:
+                    return
+
+        coppie = self._prepara_coppie(files_da_verificare, diversi, usa_hash_noti=False)
+        funzione = partial(impronta_file, algoritmo=self.hash_algorithm, blocchi=self.sample_blocks,
+                           dimensione_blocco=self.sample_block_size)
+        letti_per_file = self.sample_block_size * (self.sample_blocks + 2)
+
+        def peso(coppia):  #Byte letti per una coppia: al massimo i blocchi campione di ciascun file
+            return sum(min(stat.st_size, letti_per_file) for stat in (coppia.stat_src, coppia.stat_dst) if stat is not None)
+
+        try:
+            #La lettura di pochi blocchi è un'operazione di I/O: si usano i thread
+            for coppia, impronta_src, impronta_dst in self._elabora_a_lotti(coppie, funzione, peso, False, self.workers,
+                                                                             "impronta"):
+
+                if impronta_src is None or impronta_dst is None or impronta_src != impronta_dst:
+                    yield coppia.src, coppia.dst, coppia.stat_src.st_size
+
+                elif self.sample_escalate and coppia.stat_src.st_mtime_ns != coppia.stat_dst.st_mtime_ns:
+                    if approfondimento is None:
+                        approfondimento = threading.Thread(target=approfondisci, daemon=True)
+                        approfondimento.start()
+                    da_approfondire.put((coppia.src, coppia.dst))  #Se la coda è piena si attende il thread dell'hash
+                    approfondite += 1
+
+                else:
+                    self._verificato(coppia.dst)
+
+                while diversi:
+                    yield diversi.popleft()
+
+                yield from pronti()
+
+            while diversi:
+                yield diversi.popleft()
+
+        finally:
+            if approfondimento is not None:  #Anche se il generatore viene chiuso prima del termine, il thread va fermato
+                da_approfondire.put(self.FINE)
+
+        if approfondimento is not None:
+            yield from iter(approfonditi.get, self.FINE)
+            approfondimento.join()
+            print(f"\n{approfondite} file verificati anche con hash completo")
+
+# ==================== VERIFICA HASH ======================
+
+    def _prepara_coppie(self, files_da_verificare, files_diversi, usa_hash_noti=True):
+        """
+        Generatore che prepara le coppie per la pipeline di confronto: legge lo stat() dei file,
+        scarta le coppie con dimensioni diverse (aggiungendole a "files_diversi") e, se richiesto,
+        recupera gli hash già noti dal manifest e dalla cache.
+
+        Argomenti in ingresso:
+            files_da_verificare: Iterabile di tuple (src_file, dst_file)
+            files_diversi: Lista o coda a cui aggiungere le tuple (src_file, dst_file, dimensione) sicuramente diverse
+            usa_hash_noti: True per usare gli hash di manifest e cache (solo per l'hash completo)
+
+        Yields:
+            Oggetti CoppiaHash
+        """
+        for src, dst in files_da_verificare:
+            try:
+                stat_src = os.stat(src)
+                stat_dst = None
+                hash_dst = None
+
+                #Con il manifest in uso l'hash del file in destinazione può essere già noto, senza rileggerlo;
+                #con "validate_manifest" vale solo se il file reale non è cambiato dalla registrazione
+                if usa_hash_noti and self.manifest_attivo:
+                    if self.validate_manifest:
+                        stat_dst = os.stat(dst)
+                    hash_dst = self.manifest.hash_registrato(self._rel_destinazione(dst), self.hash_algorithm, stat_dst)
+
+                if hash_dst is None and stat_dst is None:
+                    stat_dst = os.stat(dst)
+
+            except OSError:
+                files_diversi.append((src, dst, 0))  #File non leggibile: viene ricopiato (l'eventuale errore emergerà nella copia)
+                continue
+
+            #Se le dimensioni sono diverse il file è sicuramente modificato: nessun hash da calcolare
+            if stat_dst is not None and stat_src.st_size != stat_dst.st_size:
+                files_diversi.append((src, dst, stat_src.st_size))
+                continue
+
+            hash_src = None
+
+            if usa_hash_noti and self.cache_hash is not None:  #La cache viene consultata qui, prima di coinvolgere i worker
+                hash_src = self.cache_hash.cerca(stat_src)
+                if hash_dst is None:
+                    hash_dst = self.cache_hash.cerca(stat_dst)
+
+            yield CoppiaHash(src, dst, stat_src, stat_dst, hash_src, hash_dst)
+
+    def verifica_con_hash(self, files_da_verificare):
+        """
+        Metodo che verifica l'uguaglianza dei file usando l'hash del contenuto.
+        Le coppie con dimensioni diverse vengono considerate modificate senza calcolare alcun hash;
+        le altre vengono inviate in lotti alla pipeline di confronto ("_elabora_a_lotti").
+
+        Args:
+            files_da_verificare: Lista di tuple (src_file, dst_file)
+
+        Returns:
+            Lista di tuple (src_file, dst_file) dei file che sono diversi
+        """
+        if not files_da_verificare:  #Se non ci sono file da verificare, restituisce una lista vuota in uscita
+            return []
+
+        print(f"\nCalcolo hash per {len(files_da_verificare)} file...")
+
+        #Inizializza la lista di quei file tali che quello in destinazione è diverso dal relativo file nella sorgente
+        files_diversi = [(src, dst) for src, dst, dimensione in self._flusso_hash(files_da_verificare)]
+
+        print(f"\n{len(files_diversi)} file necessitano aggiornamento")
+
+        return files_diversi  #Restituisce in uscita la lista creata
+
+    def _flusso_hash(self, files_da_verificare):
+        """
+        Generatore che confronta gli hash delle coppie man mano che arrivano.
+        Viene utilizzato nel metodo "sync" in modalità "hash".
+
+        Argomenti in ingresso:
+            files_da_verificare: Iterabile (anche una coda) di tuple (src_file, dst_file)
+
+        Yields:
+            Tuple (src_file, dst_file, dimensione) dei file che sono diversi
+        """
+        diversi = deque()  #File sicuramente diversi (dimensioni diverse oppure non leggibili), riempita da "_prepara_coppie"
+
+        coppie = self._prepara_coppie(files_da_verificare, diversi)
+        funzione = partial(hash_file, algoritmo=self.hash_algorithm)
+
+        def peso(coppia):  #Byte da leggere per una coppia: solo i file il cui hash non è già noto
+            return sum(stat.st_size for stat, noto in ((coppia.stat_src, coppia.hash_src), (coppia.stat_dst, coppia.hash_dst))
+                       if stat is not None and noto is None)
+
+        completati = 0  #Inizializza il numero di coppie completate
+
+        #Il calcolo dell'hash usa tutti i core CPU, con thread o processi
+        for coppia, hash_src, hash_dst in self._elabora_a_lotti(coppie, funzione, peso, self.hash_executor == "process",
+                                                                 cpu_count()):
+            completati += 1
+
+            for percorso, stat, noto, hash_value in ((coppia.src, coppia.stat_src, coppia.hash_src, hash_src),
+                                                     (coppia.dst, coppia.stat_dst, coppia.hash_dst, hash_dst)):
+                if hash_value is None:
+                    self._mostra(f"\nErrore calcolando hash per {Path(percorso).name}")
+
+                elif noto is None and stat is not None and self.cache_hash is not None:
+                    self.cache_hash.memorizza(stat, hash_value)  #L'hash appena calcolato viene memorizzato nella cache
+
+            if hash_src is None or hash_dst is None or hash_src != hash_dst:
+                yield coppia.src, coppia.dst, coppia.stat_src.st_size  #Hash diversi oppure non calcolabili
+
+            else:  #Il file è identico: il suo hash viene memorizzato nel manifest
+                if self.manifest is not None and coppia.stat_dst is not None:
+                    #Il file è stato letto dal disco: la voce viene aggiornata anche con il suo stat reale
+                    self.manifest.registra(self._rel_destinazione(coppia.dst), coppia.stat_dst,
+                                           f"{self.hash_algorithm}:{hash_dst}")
+                elif self.manifest is not None:
+                    self.manifest.imposta_hash(self._rel_destinazione(coppia.dst), hash_dst, self.hash_algorithm)
+                self._verificato(coppia.dst)
+
+            if completati % 100 == 0:  #Mostra progresso ogni 100 coppie (in modalità "quiet" solo la riga di avanzamento)
+                self._mostra(f"\nCoppie verificate: {completati}")
+
+            while diversi:
+                yield diversi.popleft()
+
+        while diversi:
+            yield diversi.popleft()
+
+# ==================== FILE DA ELIMINARE ======================
+
+    def trova_file_da_eliminare(self):
+        """
+        Metodo che trova i file nella destinazione che non esistono nella sorgente.
+        Le cartelle che non esistono nella sorgente vengono restituite una sola volta, senza il loro contenuto.
+
+        Returns:
+            Lista di percorsi dei file e delle cartelle da eliminare
+        """
+        return [azione.dst for azione in self._scansiona() if azione.tipo in ("elimina", "elimina_cartella")]
+
+# ==================== PIPELINE ======================
+
+    FINE = None  #Segnale di fine inserito nelle code della pipeline
+
+    def _leggi_coda(self, coda, terminata):
+        #Legge una coda fino al segnale di fine; "terminata" (threading.Event) indica che il segnale è stato consumato
+        yield from iter(coda.get, self.FINE)
+        terminata.set()
+
+    def _svuota(self, coda, terminata):
+        #Consuma una coda fino al segnale di fine, per non bloccare chi la sta ancora riempiendo.
+        #Se il segnale è già stato letto la coda non riceverà altro: un get() attenderebbe per sempre
+        if not terminata.is_set():
+            for _ in self._leggi_coda(coda, terminata):
+                pass
+
+    def _fase_scansione(self, azioni, coda_azioni):
+        """
+        Prima fase della pipeline (thread dedicato): il motore di confronto inserisce le azioni nella coda
+        man mano che le cartelle vengono lette.
+
+        Argomenti in ingresso:
+            azioni: Generatore delle azioni ("_scansiona" oppure, nel metodo "watch", "_azioni_per_percorsi")
+            coda_azioni: Coda limitata verso la fase di smistamento
+        """
+        try:
+            for azione in azioni:
+                coda_azioni.put(azione)  #Se la coda è piena la scansione attende le fasi successive
+
+        except Exception as e:
+            self.errors.append(f"\nErrore durante la scansione: {str(e)}")
+            self.scansione_incompleta = True
+
+        finally:
+            coda_azioni.put(self.FINE)
+
+    def _fase_smistamento(self, coda_azioni, coda_verifica, thread_verifica, pianificatore):
+        """
+        Seconda fase della pipeline (thread dedicato): smista le azioni della scansione.
+        Invia copie ed eliminazioni al pianificatore ed i file da confrontare alla fase di verifica. Al termine chiude le fasi successive.
+
+        Argomenti in ingresso:
+            coda_azioni: Coda delle azioni prodotte dalla scansione
+            coda_verifica: Coda limitata verso la fase di verifica
+            thread_verifica: Thread della fase di verifica, da attendere prima di chiudere il pianificatore
+            pianificatore: Pianificatore di copie ed eliminazioni
+        """
+        terminata = threading.Event()
+
+        try:
+            for azione in self._leggi_coda(coda_azioni, terminata):
+
+                if azione.tipo in ("copia", "aggiorna"):
+                    pianificatore.aggiungi(azione.src_stat.st_size, ("copia", azione.src, azione.dst))
+
+                elif azione.tipo == "verifica":
+                    coda_verifica.put((azione.src, azione.dst))
+
+                else:
+                    pianificatore.aggiungi(0, (azione.tipo, azione.dst))  #Eliminazione di un file o di un sottoalbero
+
+        except Exception as e:
+            self.errors.append(f"\nErrore durante lo smistamento: {str(e)}")
+            self._svuota(coda_azioni, terminata)
+
+        finally:
+            coda_verifica.put(self.FINE)
+            thread_verifica.join()  #Le ultime copie possono arrivare dalla verifica
+            pianificatore.chiudi()
+
+    def _fase_verifica(self, coda_verifica, pianificatore):
+        """
+        Fase di verifica della pipeline (thread dedicato): confronta con hash o impronta le coppie
+        ricevute ed invia al pianificatore i file diversi, man mano che vengono individuati.
+
+        Argomenti in ingresso:
+            coda_verifica: Coda delle coppie (src_file, dst_file) da verificare
+            pianificatore: Pianificatore di copie ed eliminazioni
+        """
+        terminata = threading.Event()
+        coppie = self._leggi_coda(coda_verifica, terminata)
+
+        try:
+            flusso = self._flusso_impronte(coppie) if self.compare_mode == "sample" else self._flusso_hash(coppie)
+
+            for src, dst, dimensione in flusso:
+                pianificatore.aggiungi(dimensione, ("copia", src, dst))
+
+        except Exception as e:
+            self.errors.append(f"\nErrore durante la verifica: {str(e)}")
+            self._svuota(coda_verifica, terminata)
+
+    def _esegui_pipeline(self, azioni):
+        """
+        Metodo che esegue le azioni prodotte da un generatore attraverso la pipeline di sincronizzazione.
+        Viene utilizzato nei metodi "sync" e "watch".
+
+        Argomenti in ingresso:
+            azioni: Generatore di oggetti Azione
+        """
+        #Le fasi lavorano in pipeline, collegate da code limitate:
+        #scansione -> smistamento -> (verifica hash/impronta) -> pianificatore di copie ed eliminazioni
+        #La copia inizia appena la scansione trova il primo file diverso e la memoria resta limitata
+        coda_azioni = queue.Queue(maxsize=self.pipeline_queue_size)  #Azioni prodotte dalla scansione
+        coda_verifica = queue.Queue(maxsize=self.pipeline_queue_size)  #Coppie da verificare con hash o impronta
+        pianificatore = self.crea_pianificatore(max_in_coda=self.pipeline_queue_size)
+
+        thread_scansione = threading.Thread(target=self._fase_scansione, args=(azioni, coda_azioni), daemon=True)
+        thread_verifica = threading.Thread(target=self._fase_verifica, args=(coda_verifica, pianificatore), daemon=True)
+        thread_smistamento = threading.Thread(target=self._fase_smistamento,
+                                              args=(coda_azioni, coda_verifica, thread_verifica, pianificatore), daemon=True)
+
+        for thread in (thread_scansione, thread_verifica, thread_smistamento):
+            thread.start()
+
+        #Il thread principale raccoglie i risultati man mano che copie ed eliminazioni vengono completate
+        for lavoro, (success, message) in pianificatore:
+
+            if success:  #Se la variabile "success" è True, aggiorna il numero di file copiati o eliminati
+                if lavoro[0] == "copia":
+                    self.files_copied += 1  #Aggiorna il contatore dei file copiati, inizializzato nella definizione della classe FolderSynchronizer
+                elif lavoro[0] == "elimina":
+                    self.files_deleted += 1  #Aggiorna il contatore dei file eliminati
+                else:
+                    self.folders_deleted += 1  #Aggiorna il contatore delle cartelle eliminate
+                if self.diario is not None:
+                    self.diario.completa(lavoro[-1])  #Il lavoro è concluso: non verrà ripetuto in caso di ripresa
+                self._mostra(message)
+            else:
+                self.errors.append(message)   #Altrimenti aggiunge il messaggio di errore alla lista "errors" e lo stampa
+                self._mostra(message)
+
+        for thread in (thread_scansione, thread_smistamento, thread_verifica):
+            thread.join()
+
+# ==================== SINCRONIZZATORE ======================
+
+    def _mostra(self, message):
+        """
+        Metodo che mostra l'esito di una copia o di un'eliminazione: una riga per file oppure,
+        in modalità "quiet", una riga di avanzamento ogni "progress_interval" secondi.
+        """
+        if not self.quiet:
+            print(f"  {message}")
+            return
+
+        adesso = time.monotonic()
+        if adesso - self.ultimo_avanzamento < self.progress_interval:
+            return
+
+        self.ultimo_avanzamento = adesso
+        durata = adesso - self.metriche.inizio
+        _, byte_copiati = self.metriche.totali("copia")
+
+        print(f"  Avanzamento: {self.files_copied} copiati ({byte_copiati / 1024 ** 2:.1f} MB, "
+              f"{byte_copiati / 1024 ** 2 / durata:.1f} MB/s), {self.files_deleted} eliminati, "
+              f"{len(self.errors)} errori, {durata:.0f} secondi")
+
+    def rapporto_metriche(self):
+        """
+        Metodo che restituisce le metriche dell'ultima sincronizzazione con le relative statistiche.
+
+        Returns:
+            Dizionario nel formato di Metriche.rapporto, con in più "statistiche"
+        """
+        rapporto = self.metriche.rapporto()
+        rapporto["statistiche"] = {
+            "file_copiati": self.files_copied,
+            "file_eliminati": self.files_deleted,
+            "cartelle_eliminate": self.folders_deleted,
+            "errori": len(self.errors),
+            "strategie_copia": dict(self.strategie_copia),
+        }
+        return rapporto
+
+    def scrivi_metriche(self, percorso, formato=None):
+        """
+        Metodo che scrive il rapporto delle metriche su file, in modo atomico (file temporaneo e rinomina),
+        così che chi lo legge (es. il textfile collector di Prometheus) non veda mai un file parziale.
+
+        Argomenti in ingresso:
+            percorso: Percorso del file da scrivere
+            formato: "json" oppure "prometheus" (default: "metrics_format")
+        """
+        formato = formato or self.metrics_format
+
+        if formato == "prometheus":
+            contenuto = self.metriche.in_prometheus([
+                ("files_copied", "File copiati.", self.files_copied),
+                ("files_deleted", "File eliminati.", self.files_deleted),
+                ("folders_deleted", "Cartelle eliminate per intero.", self.folders_deleted),
+                ("errors", "Errori riscontrati.", len(self.errors)),
+            ])
+        else:
+            contenuto = json.dumps(self.rapporto_metriche(), indent=2)
+
+        temporaneo = f"{percorso}.tmp"
+        with open(temporaneo, "w", encoding="utf-8") as f:
+            f.write(contenuto)
+        os.replace(temporaneo, percorso)
+
+    def _inizia_sincronizzazione(self):
+        """
+        Metodo che stampa l'intestazione ed apre manifest e cache degli hash.
+        Viene utilizzato nei metodi "sync" e "sync_async".
+        """
+        print("=" * 60)
+        print("INIZIO SINCRONIZZAZIONE")
+        print("=" * 60)
+        print(f"Sorgente: {self.source}")
+        print(f"Destinazione: {self.destination}")
+        print(f"Workers: {self.workers}" + (" (regolazione automatica)" if self.autotune else ""))
+        print(f"Confronto: {self.compare_mode}" + (f" ({self.hash_algorithm})" if self.compare_mode != "mtime" else ""))
+        if self.max_bytes_per_second is not None or self.max_ops_per_second is not None:
+            print("Limiti: " + ", ".join(limite for limite in (
+                f"{self.max_bytes_per_second / 1024 ** 2:.1f} MB/s" if self.max_bytes_per_second is not None else None,
+                f"{self.max_ops_per_second} operazioni/s" if self.max_ops_per_second is not None else None) if limite))
+
+        self.apri_manifest()
+        if self.manifest is not None:
+            print(f"Manifest: {'in uso' if self.manifest_attivo else 'in costruzione (scansione completa)'}")
+
+        if self.compare_mode != "mtime":
+            self.apri_cache_hash()
+
+        print("=" * 60)
+
+        self.metriche = Metriche()  #Le metriche si riferiscono solo a questa sincronizzazione
+        self.ultimo_avanzamento = time.monotonic()
+        self.scansione_incompleta = False
+        self.cartelle_pulite = set()
+
+    def _termina_sincronizzazione(self, start_time):
+        """
+        Metodo che chiude manifest e cache degli hash e stampa il riepilogo.
+        Viene utilizzato nei metodi "sync" e "sync_async".
+
+        Argomenti in ingresso:
+            start_time: Momento di inizio della sincronizzazione (time.time())
+        """
+        print(f"\nCopiati {self.files_copied} file, eliminati {self.files_deleted} file e {self.folders_deleted} cartelle")
+
+        #Il manifest descrive l'intera destinazione solo se la scansione non ha saltato nessuna cartella
+        self.chiudi_manifest(completo=not self.scansione_incompleta)
+
+        if self.cache_hash is not None:
+            print(f"\nCache hash: {self.cache_hash.trovati} trovati, {self.cache_hash.mancanti} da calcolare")
+            self.chiudi_cache_hash()
+
+        #RIEPILOGO
+
+        elapsed_time = time.time() - start_time  #Tempo trascorso come momento attuale meno momento iniziale
+
+        print("\n" + "=" * 60)
+        print("RIEPILOGO SINCRONIZZAZIONE")
+        print("=" * 60)
+        print(f"File copiati: {self.files_copied}")
+        print(f"File eliminati: {self.files_deleted}")
+        print(f"Cartelle eliminate: {self.folders_deleted}")
+        print(f"Errori: {len(self.errors)}")
+        if self.strategie_copia:
+            print("Strategie di copia: " + ", ".join(f"{nome} {numero}" for nome, numero in self.strategie_copia.most_common()))
+        print(f"Tempo impiegato: {elapsed_time:.2f} secondi")
+
+        rapporto = self.metriche.rapporto()
+        for fase, voce in rapporto["fasi"].items():
+            print(f"  Fase {fase}: {voce['durata']:.2f} secondi, {voce['file']} file, {voce['byte'] / 1024 ** 2:.1f} MB")
+        for risorsa, secondi in rapporto["attesa_limitatore"].items():
+            print(f"  Attesa per il limite di {risorsa}: {secondi:.2f} secondi (somma dei worker)")
+        for corsia, voce in rapporto["concorrenza"].items():
+            print(f"  Thread corsia {corsia}: {voce['attuale']} (tra {voce['minima']} e {voce['massima']}, "
+                  f"{voce['regolazioni']} regolazioni)")
+
+        print("=" * 60)
+
+        if self.metrics_file is not None:
+            try:
+                self.scrivi_metriche(self.metrics_file)
+                print(f"\nMetriche scritte in {self.metrics_file}")
+            except OSError as e:
+                print(f"\nErrore scrivendo le metriche: {str(e)}")
+
+        if self.errors:  #Se ci sono stati errori
+
+            print("\nERRORI RISCONTRATI:")
+            for error in self.errors:
+                print(f"  {error}")  #Stampa tutti gli errori riscontrati
+
+        print("\nSincronizzazione completata!")
+
+    def sync(self):
+        """
+        Metodo che esegue la sincronizzazione completa.
+        Viene utilizzato nel "main".
+        """
+        start_time = time.time()  #Salva il momento di inizio sincronizzazione
+
+        self._inizia_sincronizzazione()
+
+        print("\nSincronizzazione in corso...")
+
+        try:
+            self._esegui_pipeline(self.apri_diario())
+
+        except BaseException:  #Interruzione (anche Ctrl+C): il lavoro già svolto viene salvato per la ripresa
+            self.chiudi_diario()
+            self.chiudi_manifest()  #Le registrazioni in sospeso vengono confermate, ma il manifest resta incompleto
+            self.chiudi_cache_hash()
+            raise
+
+        self.chiudi_diario(completato=True)
+
+        self._termina_sincronizzazione(start_time)
+
+# ==================== SINCRONIZZAZIONE ASINCRONA ======================
+
+    def _file_diversi(self, src_file, dst_file):
+        """
+        Metodo che confronta due file con hash completo o impronta a campione, secondo "compare_mode".
+        Viene utilizzato da "sync_async" per le azioni "verifica".
+
+        Returns:
+            True se i file sono diversi (o non leggibili)
+        """
+        inizio = time.monotonic()
+        diversi = None
+
+        if self.compare_mode == "sample":
+            (_, impronta_src, ok_src), (_, impronta_dst, ok_dst) = self.calcola_impronta(src_file), self.calcola_impronta(dst_file)
+
+            if not (ok_src and ok_dst) or impronta_src != impronta_dst:
+                diversi = True
+
+            elif not self.sample_escalate or os.stat(src_file).st_mtime_ns == os.stat(dst_file).st_mtime_ns:
+                diversi = False
+
+            self.metriche.registra("impronta", inizio)
+            inizio = time.monotonic()
+
+        if diversi is None:  #Hash completo (anche quando l'impronta non basta a decidere)
+            (_, hash_src, ok_src), (_, hash_dst, ok_dst) = self.calcola_hash(src_file), self.calcola_hash(dst_file)
+            diversi = not (ok_src and ok_dst) or hash_src != hash_dst
+            self.metriche.registra("hash", inizio)
+
+        return diversi
+
+    def _leggi_voci(self, percorso):
+        #Legge una cartella senza stat() dei file: restituisce (voci dei file, nomi delle sottocartelle) oppure None
+        try:
+            with os.scandir(percorso) as voci:
+                voci = list(voci)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        finally:
+            self.metriche.conta("scandir")
+
+        return [voce for voce in voci if voce.is_file()], {voce.name for voce in voci if voce.is_dir(follow_symlinks=False)}
+
+    async def _elenca_cartella_async(self, percorso, metadati):
+        """
+        Coroutine equivalente a "_elenca_cartella": legge la cartella e poi interroga i file con stat() in parallelo.
+
+        Argomenti in ingresso:
+            percorso: Percorso della cartella da leggere
+            metadati: Coroutine che esegue una funzione nell'executor con il semaforo delle operazioni sui metadati
+
+        Returns:
+            Stesso formato di "_elenca_cartella"
+        """
+        elenco = await metadati(self._leggi_voci, percorso)
+        if elenco is None:
+            return None
+
+        voci, cartelle = elenco
+        self.metriche.conta("stat", len(voci))
+        stat = await asyncio.gather(*(metadati(voce.stat) for voce in voci), return_exceptions=True)
+
+        #I file spariti tra la lettura della cartella ed il loro stat() vengono ignorati
+        files = {voce.name: risultato for voce, risultato in zip(voci, stat) if not isinstance(risultato, BaseException)}
+
+        return files, cartelle
+
+    async def sync_async(self):
+        """
+        Coroutine che esegue la sincronizzazione completa con asyncio, pensata per filesystem ad alta latenza
+        (cartelle di rete), dove ogni stat() costa un viaggio di andata e ritorno.
+        Le operazioni bloccanti vengono eseguite in un executor di thread: lettura delle cartelle, stat(),
+        creazioni ed eliminazioni sono limitate da "metadata_concurrency", copie e verifiche da "data_concurrency".
+        Aggiorna le stesse statistiche di "sync".
+
+        Esempio:
+            asyncio.run(syncer.sync_async())
+        """
+        start_time = time.time()
+
+        self._inizia_sincronizzazione()
+
+        print("\nSincronizzazione asincrona in corso...")
+
+        loop = asyncio.get_running_loop()
+        semaforo_metadati = asyncio.Semaphore(self.metadata_concurrency)
+        semaforo_dati = asyncio.Semaphore(self.data_concurrency)
+        in_volo = asyncio.Semaphore(self.pipeline_queue_size)  #Limita le azioni in attesa, per mantenere limitata la memoria
+
+        executor = ThreadPoolExecutor(max_workers=self.metadata_concurrency + self.data_concurrency)
+
+        async def esegui(semaforo, funzione, *args):
+            async with semaforo:
+                return await loop.run_in_executor(executor, partial(funzione, *args))
+
+        metadati = partial(esegui, semaforo_metadati)
+        dati = partial(esegui, semaforo_dati)
+
+        async def applica(azione):
+            try:
+                if azione.tipo == "verifica" and not await dati(self._file_diversi, azione.src, azione.dst):
+                    return  #File identico
+
+                if azione.tipo == "elimina":
+                    success, message = await metadati(self.elimina_file, azione.dst)
+                    self.files_deleted += success  #Le statistiche vengono aggiornate solo dal ciclo di eventi, senza lock
+                elif azione.tipo == "elimina_cartella":
+                    success, message = await metadati(self.elimina_cartella, azione.dst)
+                    self.folders_deleted += success
+                else:
+                    success, message = await dati(self.copia_file, azione.src, azione.dst)
+                    self.files_copied += success
+
+                if not success:
+                    self.errors.append(message)
+                self._mostra(message)
+
+            except Exception as e:
+                self.errors.append(f"\nErrore sincronizzando {Path(azione.dst).name}: {str(e)}")
+
+            finally:
+                in_volo.release()
+
+        async def confronta(rel_path, in_sorgente, in_destinazione):
+            cartella_src = os.path.join(self.source, rel_path)
+            cartella_dst = os.path.join(self.destination, rel_path)
+            inizio = time.monotonic()
+
+            try:
+                elenco_src, elenco_dst = await asyncio.gather(
+                    self._elenca_cartella_async(cartella_src, metadati) if in_sorgente else asyncio.sleep(0),
+                    (self._elenca_cartella_async(cartella_dst, metadati) if not self.manifest_attivo
+                     else metadati(self._elenca_destinazione, cartella_dst, rel_path)) if in_destinazione else asyncio.sleep(0))
+
+            except OSError as e:
+                self.errors.append(f"\nErrore leggendo la cartella {rel_path or '.'}: {str(e)}")
+                self.scansione_incompleta = True
+                return
+
+            self.metriche.registra("scansione", inizio, file=len(elenco_src[0]) if elenco_src is not None else 0)
+            azioni, sottocartelle = self._confronta_elenchi(rel_path, in_sorgente, elenco_src, elenco_dst)
+
+            attivita = []
+            for azione in azioni:
+                await in_volo.acquire()
+                attivita.append(asyncio.ensure_future(applica(azione)))
+
+            attivita += [asyncio.ensure_future(confronta(*sottocartella)) for sottocartella in sottocartelle]
+
+            await asyncio.gather(*attivita)
+
+        try:
+            await confronta("", True, True)
+        finally:
+            executor.shutdown(wait=True)
+
+        self._termina_sincronizzazione(start_time)
+
+# ==================== OSSERVAZIONE CONTINUA ======================
+
+    def _azioni_per_percorsi(self, percorsi):
+        """
+        Generatore che confronta solo i percorsi modificati, invece dell'intero albero.
+        Viene utilizzato nel metodo "watch".
+
+        Argomenti in ingresso:
+            percorsi: Insieme dei percorsi modificati, relativi a "source" ("" per l'intero albero)
+
+        Yields:
+            Oggetti Azione
+        """
+        if "" in percorsi:
+            yield from self._scansiona()
+            return
+
+        for rel_path in sorted(percorsi):
+
+            #Se una cartella superiore è già tra i percorsi modificati, il percorso viene confrontato insieme ad essa
+            antenato = os.path.dirname(rel_path)
+            while antenato and antenato not in percorsi:
+                antenato = os.path.dirname(antenato)
+            if antenato or rel_path.split(os.sep)[0] == CARTELLA_METADATI:
+                continue
+
+            src_file = os.path.join(self.source, rel_path)
+            dst_file = os.path.join(self.destination, rel_path)
+
+            if os.path.isdir(src_file):
+                yield from self._scansiona(rel_path)  #Cartella creata o spostata: si confronta il suo sottoalbero
+
+            elif not os.path.exists(src_file) and os.path.isdir(dst_file):
+                yield Azione("elimina_cartella", None, dst_file, None, None)  #Cartella eliminata dalla sorgente
+
+            elif os.path.isfile(src_file):
+                try:
+                    stat_src = os.stat(src_file)
+                    stat_dst = os.stat(dst_file) if os.path.isfile(dst_file) else None
+                except OSError:
+                    continue  #Il file è cambiato di nuovo: arriverà un altro evento
+
+                azione = self._confronta_file(src_file, dst_file, stat_src, stat_dst)
+                if azione is not None:
+                    yield azione
+
+            elif os.path.isfile(dst_file):
+                yield Azione("elimina", None, dst_file, None, None)  #File eliminato dalla sorgente
+
+    def watch(self, debounce=0.5, poll_interval=2.0, use_inotify=True, stop_event=None):
+        """
+        Metodo che esegue una sincronizzazione completa e poi resta in ascolto delle modifiche della sorgente,
+        applicando solo i percorsi modificati con la stessa pipeline di "sync" (copia_file / elimina_file).
+        Usa inotify su Linux, altrimenti rilegge periodicamente la sorgente.
+
+        Argomenti in ingresso:
+            debounce: Secondi senza nuovi eventi dopo i quali le modifiche raccolte vengono applicate
+            poll_interval: Secondi tra due letture della sorgente quando inotify non è disponibile
+            use_inotify: False per usare sempre il polling
+            stop_event: threading.Event opzionale per terminare l'osservazione (altrimenti Ctrl+C)
+        """
+        #L'osservatore viene creato prima della sincronizzazione completa, per non perdere le modifiche nel frattempo
+        osservatore = None
+        if use_inotify:
+            try:
+                osservatore = OsservatoreInotify(self.source)
+            except OSError as e:
+                print(f"\ninotify non disponibile ({str(e)}): controllo della sorgente ogni {poll_interval} secondi")
+
+        if osservatore is None:
+            osservatore = OsservatorePolling(self.source, poll_interval)
+
+        self.sync()
+
+        self.apri_manifest()
+        if self.compare_mode != "mtime":
+            self.apri_cache_hash()
+
+        print("\nIn ascolto delle modifiche (Ctrl+C per terminare)...")
+
+        in_sospeso = set()  #Percorsi modificati non ancora applicati: eventi ripetuti sullo stesso file si uniscono
+        primo_evento = ultimo_evento = 0
+
+        try:
+            while stop_event is None or not stop_event.is_set():
+                try:
+                    modificati = osservatore.leggi(debounce if in_sospeso else 1.0)
+
+                except OSError as e:
+                    if not isinstance(osservatore, OsservatoreInotify):
+                        raise
+                    #Un watch non aggiungibile (ad esempio limite fs.inotify.max_user_watches raggiunto): si passa
+                    #al polling, ed il confronto dell'intero albero recupera gli eventi persi
+                    print(f"\ninotify non più utilizzabile ({str(e)}): controllo della sorgente ogni {poll_interval} secondi")
+                    osservatore.chiudi()
+                    osservatore = OsservatorePolling(self.source, poll_interval)
+                    modificati = {""}
+
+                adesso = time.monotonic()
+
+                if modificati:
+                    if not in_sospeso:
+                        primo_evento = adesso
+                    in_sospeso |= modificati
+                    ultimo_evento = adesso
+
+                #Le modifiche si applicano dopo "debounce" secondi di quiete, e comunque entro 10 volte "debounce"
+                if in_sospeso and (adesso - ultimo_evento >= debounce or adesso - primo_evento >= 10 * debounce):
+                    percorsi, in_sospeso = in_sospeso, set()
+                    copiati, eliminati = self.files_copied, self.files_deleted + self.folders_deleted
+
+                    self._esegui_pipeline(self._azioni_per_percorsi(percorsi))
+
+                    print(f"\n{len(percorsi)} percorsi modificati: copiati {self.files_copied - copiati} file, "
+                          f"eliminati {self.files_deleted + self.folders_deleted - eliminati} file e cartelle")
+
+        except KeyboardInterrupt:
+            print("\nOsservazione interrotta")
+
+        finally:
+            osservatore.chiudi()
+            #Le modifiche incrementali mantengono completo un manifest che lo era già, ma non lo completano
+            self.chiudi_manifest(completo=self.manifest_attivo and not self.scansione_incompleta)
+            self.chiudi_cache_hash()
+
+
+# ==================== SINCRONIZZAZIONE SU PIÙ DESTINAZIONI ======================
+
+class MultiFolderSynchronizer:
+    """
+    Classe che sincronizza una sorgente con più destinazioni (repliche) in una sola esecuzione.
+    La sorgente viene scansionata una sola volta e confrontata con ogni destinazione; ogni file modificato
+    viene letto una sola volta ed il suo contenuto scritto in tutte le destinazioni che ne hanno bisogno,
+    calcolandone l'hash nella stessa passata in modalità "hash".
+    Ogni destinazione è gestita da un FolderSynchronizer (manifest, cache degli hash e statistiche propri).
+    """
+
+    def __init__(self, source, destinations, workers=4, **opzioni):
+        """
+        Argomenti in ingresso:
+            source: Percorso cartella sorgente
+            destinations: Lista dei percorsi delle cartelle di destinazione
+            workers: Numero di thread/processi paralleli (default: 4)
+            opzioni: Altri parametri di FolderSynchronizer, applicati a tutte le destinazioni
+        """
+        if not destinations:
+            raise ValueError("Serve almeno una destinazione")
+
+        #Diario di ripresa e rapporto delle metriche descrivono una sola destinazione
+        for opzione in ("resume", "metrics_file"):
+            if opzioni.get(opzione):
+                raise ValueError(f"Opzione non supportata con più destinazioni: {opzione}")
+
+        self.source = source
+        self.workers = workers
+        self.repliche = [FolderSynchronizer(source, destination, workers=workers, **opzioni) for destination in destinations]
+
+        self.principale = self.repliche[0]  #Legge la sorgente e fornisce la configurazione comune
+
+        #I limiti di banda ed operazioni valgono per l'intero host, non per ogni destinazione:
+        #tutte le repliche condividono gli stessi secchi di gettoni
+        for replica in self.repliche[1:]:
+            replica.limite_byte = self.principale.limite_byte
+            replica.limite_operazioni = self.principale.limite_operazioni
+        self.files_letti = 0  #File sorgente letti una sola volta e scritti in più destinazioni
+        self.errors = []
+
+    def _confronta_cartella(self, rel_path):
+        """
+        Metodo che legge una cartella della sorgente una sola volta e la confronta con la stessa cartella
+        di ogni destinazione. Viene eseguito in parallelo da "_scansiona", una cartella per task.
+
+        Returns:
+            Tupla (gruppi, eliminazioni, sottocartelle): il dizionario {src_file: [(replica, Azione), ...]},
+            la lista delle eliminazioni (replica, Azione) e la lista delle sottocartelle della sorgente
+        """
+        inizio = time.monotonic()
+
+        try:
+            elenco_src = self.principale._elenca_cartella(os.path.join(self.source, rel_path))
+        except OSError as e:
+            self.errors.append(f"\nErrore leggendo la cartella {rel_path or '.'}: {str(e)}")
+            for replica in self.repliche:
+                replica.scansione_incompleta = True
+            return {}, [], []
+
+        self.principale.metriche.registra("scansione", inizio, file=len(elenco_src[0]) if elenco_src is not None else 0)
+
+        gruppi = {}
+        eliminazioni = []
+
+        for replica in self.repliche:
+            try:
+                elenco_dst = replica._elenca_destinazione(os.path.join(replica.destination, rel_path), rel_path)
+            except OSError as e:
+                replica.errors.append(f"\nErrore leggendo la cartella {rel_path or '.'}: {str(e)}")
+                replica.scansione_incompleta = True
+                continue
+
+            azioni, _ = replica._confronta_elenchi(rel_path, True, elenco_src, elenco_dst)
+
+            for azione in azioni:
+                if azione.tipo in ("elimina", "elimina_cartella"):
+                    eliminazioni.append((replica, azione))
+                else:
+                    gruppi.setdefault(azione.src, []).append((replica, azione))
+
+        #Le sottocartelle da visitare sono quelle della sorgente (quelle presenti solo in una destinazione vengono eliminate)
+        cartelle_src = elenco_src[1] if elenco_src is not None else set()
+        sottocartelle = [os.path.join(rel_path, nome) for nome in cartelle_src if rel_path or nome != CARTELLA_METADATI]
+
+        return gruppi, eliminazioni, sottocartelle
+
+    def _scansiona(self):
+        """
+        Generatore che scansiona in parallelo la sorgente, confrontandola con tutte le destinazioni.
+
+        Yields:
+            Tuple (dimensione, lavoro) pronte per il pianificatore
+        """
+        in_attesa = deque([""])
+        in_corso = set()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+
+            while in_attesa or in_corso:
+
+                while in_attesa and len(in_corso) < self.workers * 2:
+                    in_corso.add(executor.submit(self._confronta_cartella, in_attesa.popleft()))
+
+                completati, in_corso = wait(in_corso, return_when=FIRST_COMPLETED)
+
+                for future in completati:
+                    gruppi, eliminazioni, sottocartelle = future.result()
+                    in_attesa.extend(sottocartelle)
+
+                    for src_file, destinazioni in gruppi.items():
+                        yield destinazioni[0][1].src_stat.st_size, ("copia", src_file, destinazioni)
+
+                    for replica, azione in eliminazioni:
+                        yield 0, (azione.tipo, replica, azione.dst)
+
+    def _diversi(self, src_file, destinazioni):
+        """
+        Metodo che filtra le destinazioni da aggiornare: le azioni "verifica" vengono confrontate con hash
+        o impronta (l'hash della sorgente viene calcolato una sola volta per tutte le destinazioni).
+
+        Returns:
+            Lista di (replica, dst_file) da scrivere
+        """
+        da_scrivere = []
+        hash_src = None
+
+        for replica, azione in destinazioni:
+            if azione.tipo != "verifica":
+                da_scrivere.append((replica, azione.dst))
+                continue
+
+            if replica.compare_mode != "hash":
+                diverso = replica._file_diversi(src_file, azione.dst)
+
+            else:
+                if hash_src is None:
+                    _, hash_src, _ = replica.calcola_hash(src_file)
+
+                hash_dst = None
+                stat_dst = None
+                rel_dst = replica._rel_destinazione(azione.dst)
+
+                if replica.manifest_attivo:  #Come in "_prepara_coppie", con "validate_manifest" l'hash registrato va convalidato
+                    try:
+                        stat_dst = os.stat(azione.dst) if replica.validate_manifest else None
+                        hash_dst = replica.manifest.hash_registrato(rel_dst, replica.hash_algorithm, stat_dst)
+                    except OSError:
+                        stat_dst = None
+
+                if hash_dst is None:
+                    _, hash_dst, _ = replica.calcola_hash(azione.dst)
+
+                    if hash_dst is not None and hash_dst == hash_src and replica.manifest is not None:
+                        try:  #Il file è identico: la voce del manifest viene aggiornata con lo stat reale e l'hash
+                            replica.manifest.registra(rel_dst, stat_dst or os.stat(azione.dst),
+                                                      f"{replica.hash_algorithm}:{hash_dst}")
+                        except OSError:
+                            pass
+
+                diverso = hash_src is None or hash_dst is None or hash_src != hash_dst
+
+            if diverso:
+                da_scrivere.append((replica, azione.dst))
+
+        return da_scrivere
+
+    def copia_file(self, src_file, destinazioni):
+        """
+        Metodo che aggiorna un file in tutte le destinazioni che ne hanno bisogno, leggendolo una sola volta.
+
+        Argomenti in ingresso:
+            src_file: Percorso file sorgente
+            destinazioni: Lista di (replica, Azione) prodotta dalla scansione
+
+        Returns:
+            Lista di tuple (replica, success, message), una per destinazione scritta
+        """
+        da_scrivere = self._diversi(src_file, destinazioni)
+        principale = self.principale
+        risultati = []
+
+        if principale.delta_threshold is not None and da_scrivere:
+            #Con l'aggiornamento delta ogni destinazione riscrive solo i propri blocchi cambiati:
+            #i file già presenti vengono aggiornati singolarmente, senza la lettura condivisa
+            try:
+                delta = os.path.getsize(src_file) >= principale.delta_threshold
+            except OSError:
+                delta = False  #L'errore emergerà nella copia
+
+            if delta:
+                presenti = [(replica, dst_file) for replica, dst_file in da_scrivere if os.path.isfile(dst_file)]
+                risultati = [(replica, *replica.copia_file(src_file, dst_file)) for replica, dst_file in presenti]
+                da_scrivere = [voce for voce in da_scrivere if voce not in presenti]
+
+        if len(da_scrivere) == 1:  #Una sola destinazione: si usa il motore di copia (reflink, copy_file_range, ...)
+            replica, dst_file = da_scrivere[0]
+            return risultati + [(replica, *replica.copia_file(src_file, dst_file))]
+
+        if not da_scrivere:
+            return risultati
+
+        inizio = time.monotonic()
+        algoritmo = principale.hash_algorithm if principale.compare_mode == "hash" else None
+
+        principale._limita_operazione()  #Una sola lettura della sorgente per tutte le destinazioni
+
+        def errore(replica, e):
+            return replica, False, f"\nErrore copiando {Path(src_file).name} in {replica.destination}: {str(e)}"
+
+        pronte = []
+
+        for replica, dst_file in da_scrivere:
+            try:  #Una cartella che non si può creare (ad esempio per un file con lo stesso nome) esclude solo la sua destinazione
+                os.makedirs(os.path.dirname(dst_file), exist_ok=True)
+            except OSError as e:
+                risultati.append(errore(replica, e))
+                continue
+
+            replica._pulisci_temporanei(os.path.dirname(dst_file))
+            pronte.append((replica, dst_file))
+
+        da_scrivere = pronte
+        if not da_scrivere:
+            return risultati
+
+        #Come in FolderSynchronizer.copia_file, ogni destinazione viene scritta in un file temporaneo poi rinominato
+        temporanei = [replica._percorso_temporaneo(dst_file) for replica, dst_file in da_scrivere]
+
+        try:
+            stat_src = os.stat(src_file)
+            #Il limite di banda condiviso conta i byte letti una volta per tutte le destinazioni
+            hash_value, errori = copia_su_piu_destinazioni(src_file, temporanei, principale.copy_buffer_size, algoritmo,
+                                                           principale._limita_byte if principale.limite_byte is not None else None)
+        except BaseException as e:
+            for temporaneo in temporanei:
+                FolderSynchronizer._rimuovi_temporaneo(temporaneo)
+
+            if not isinstance(e, Exception):
+                raise
+            #Sorgente non leggibile: la copia fallisce per ogni destinazione, ciascuna con il proprio errore
+            return risultati + [errore(replica, e) for replica, _ in da_scrivere]
+
+        with principale.lock_statistiche:
+            self.files_letti += 1
+
+        for (replica, dst_file), temporaneo, errore in zip(da_scrivere, temporanei, errori):
+            try:
+                if errore is not None:
+                    raise errore
+
+                shutil.copystat(src_file, temporaneo)
+                os.replace(temporaneo, dst_file)
+
+                with replica.lock_statistiche:
+                    replica.strategie_copia["fan-out"] += 1
+
+                replica.metriche.conta("fan-out")
+                replica.metriche.registra("copia", inizio, byte=stat_src.st_size)
+
+                if replica.manifest is not None:  #L'hash calcolato durante la lettura vale anche per la copia
+                    replica.manifest.registra(replica._rel_destinazione(dst_file), os.stat(dst_file),
+                                              f"{algoritmo}:{hash_value}" if hash_value is not None else None)
+
+                if hash_value is not None and replica.cache_hash is not None:
+                    replica.cache_hash.memorizza(stat_src, hash_value)
+
+                risultati.append((replica, True, f"\nCopiato (fan-out): {Path(src_file).name} -> {replica.destination}"))
+
+            except Exception as e:
+                FolderSynchronizer._rimuovi_temporaneo(temporaneo)
+                risultati.append(errore(replica, e))
+
+        return risultati
+
+    def _mostra(self, message):
+        """
+        Metodo che mostra l'esito di una copia o di un'eliminazione, come FolderSynchronizer._mostra:
+        in modalità "quiet" una riga di avanzamento, sommata su tutte le destinazioni, ogni "progress_interval" secondi.
+        """
+        principale = self.principale
+        if not principale.quiet:
+            print(f"  {message}")
+            return
+
+        adesso = time.monotonic()
+        if adesso - self.ultimo_avanzamento < principale.progress_interval:
+            return
+
+        self.ultimo_avanzamento = adesso
+        copiati = sum(replica.files_copied for replica in self.repliche)
+        eliminati = sum(replica.files_deleted for replica in self.repliche)
+        errori = len(self.errors) + sum(len(replica.errors) for replica in self.repliche)
+
+        print(f"  Avanzamento: {copiati} copiati, {eliminati} eliminati, {errori} errori, "
+              f"{adesso - self.inizio:.0f} secondi")
+
+    def _esegui_lavoro(self, lavoro):
+        #Esegue un lavoro del pianificatore; restituisce sempre una lista di (replica, success, message)
+        try:
+            if lavoro[0] == "copia":
+                return self.copia_file(lavoro[1], lavoro[2])
+
+            replica = lavoro[1]
+            if lavoro[0] == "elimina_cartella":
+                return [(replica, *replica.elimina_cartella(lavoro[2]))]
+            return [(replica, *replica.elimina_file(lavoro[2]))]
+
+        except Exception as e:
+            return [(None, False, f"\nErrore: {str(e)}")]
+
+    def sync(self):
+        """
+        Metodo che esegue la sincronizzazione completa della sorgente con tutte le destinazioni.
+        """
+        start_time = time.time()
+        principale = self.principale
+        self.inizio = self.ultimo_avanzamento = time.monotonic()  #Per la riga di avanzamento in modalità "quiet"
+
+        print("=" * 60)
+        print("INIZIO SINCRONIZZAZIONE SU PIÙ DESTINAZIONI")
+        print("=" * 60)
+        print(f"Sorgente: {self.source}")
+        for replica in self.repliche:
+            print(f"Destinazione: {replica.destination}")
+        print(f"Workers: {self.workers}")
+        print(f"Confronto: {principale.compare_mode}")
+        print("=" * 60)
+
+        for replica in self.repliche:
+            replica.apri_manifest()
+            if replica.compare_mode != "mtime":
+                replica.apri_cache_hash()
+            replica.metriche = Metriche()
+            replica.scansione_incompleta = False
+
+        pianificatore = principale.crea_pianificatore(principale.pipeline_queue_size, self._esegui_lavoro)
+
+        def scansione():  #La scansione alimenta il pianificatore mentre il thread principale raccoglie i risultati
+            try:
+                for dimensione, lavoro in self._scansiona():
+                    pianificatore.aggiungi(dimensione, lavoro)
+            except Exception as e:
+                self.errors.append(f"\nErrore durante la scansione: {str(e)}")
+                for replica in self.repliche:
+                    replica.scansione_incompleta = True
+            finally:
+                pianificatore.chiudi()
+
+        print("\nSincronizzazione in corso...")
+        thread_scansione = threading.Thread(target=scansione, daemon=True)
+        thread_scansione.start()
+
+        for lavoro, risultati in pianificatore:
+            for replica, success, message in risultati:
+                if replica is None:
+                    self.errors.append(message)
+                elif not success:
+                    replica.errors.append(message)
+                elif lavoro[0] == "copia":
+                    replica.files_copied += 1
+                elif lavoro[0] == "elimina":
+                    replica.files_deleted += 1
+                else:
+                    replica.folders_deleted += 1
+
+                if success:
+                    self._mostra(message)
+                else:
+                    print(f"  {message}")  #Gli errori vengono mostrati anche in modalità "quiet"
+
+        thread_scansione.join()
+
+        for replica in self.repliche:
+            replica.chiudi_manifest(completo=not replica.scansione_incompleta)
+            replica.chiudi_cache_hash()
+
+        #RIEPILOGO
+
+        elapsed_time = time.time() - start_time
+
+        print("\n" + "=" * 60)
+        print("RIEPILOGO SINCRONIZZAZIONE")
+        print("=" * 60)
+        print(f"File letti una volta per più destinazioni: {self.files_letti}")
+        for replica in self.repliche:
+            print(f"{replica.destination}: {replica.files_copied} copiati, {replica.files_deleted} file e "
+                  f"{replica.folders_deleted} cartelle eliminati, {len(replica.errors)} errori")
+        print(f"Tempo impiegato: {elapsed_time:.2f} secondi")
+        print("=" * 60)
+
+        errori = self.errors + [error for replica in self.repliche for error in replica.errors]
+        if errori:
+            print("\nERRORI RISCONTRATI:")
+            for error in errori:
+                print(f"  {error}")
+
+        print("\nSincronizzazione completata!")
+
+
+# ==================== MAIN ======================
+
+if __name__ == "__main__":
+
+    #Inserire i percorsi delle cartelle
+    source_folder = Path(r"Sorgente")
+    destination_folder = Path(r"Destinazione")
+
+    #Si spiega la possibilità di scegliere se usare l'hash oppure no
+    print("\nScegli modalità di sincronizzazione:")
+    print("1. Veloce (controllo data/dimensione)")
+    print("2. Sicura (verifica hash MD5)")
+    print("3. Campione (impronta di inizio, fine e blocchi intermedi)")
+
+    scelta = input("\nInserisci 1, 2 o 3: ").strip()
+
+    #Ad ogni scelta corrisponde una modalità di confronto, la 1 è quella predefinita
+    compare_mode = {"2": "hash", "3": "sample"}.get(scelta, "mtime")
+
+    #Crea il sincronizzatore
+    syncer = FolderSynchronizer(
+        source=source_folder,
+        destination=destination_folder,
+        workers=4,  # Usa 4 thread/processi paralleli
+        compare_mode=compare_mode
+    )
+
+    #Si può restare in ascolto delle modifiche dopo la prima sincronizzazione
+    continua = input("\nRestare in ascolto delle modifiche? (s/n): ").strip().lower() == "s"
+
+    #Esegui la sincronizzazione
+    if continua:
+        syncer.watch()
+    else:
+        syncer.sync()
+
+
+    #Si può automatizzare senza input utente usando direttamente le righe sotto
+
+    #syncer = FolderSynchronizer(source_folder, destination_folder, workers=4, use_hash=False)
     #syncer.sync()
\ No newline at end of file
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+import folder_sync
+from folder_sync import FolderSynchronizer, OsservatoreInotify
+
+
+class TestWatch(unittest.TestCase):
+
+    def setUp(self):
+        self.cartella = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.cartella.name, "src")
+        self.destination = os.path.join(self.cartella.name, "dst")
+        os.makedirs(self.source)
+        os.makedirs(self.destination)
+
+    def tearDown(self):
+        self.cartella.cleanup()
+
+    @unittest.skipIf(folder_sync.libc is None, "inotify non disponibile")
+    def test_inotify_radice(self):
+        #La radice deve corrispondere al percorso relativo "", anche quando viene passata con il separatore finale
+        for radice in (self.source, os.path.join(self.source, "")):
+            osservatore = OsservatoreInotify(radice)
+            try:
+                os.makedirs(os.path.join(self.source, "n"), exist_ok=True)
+                self.assertEqual(osservatore.leggi(2.0), {"n"})
+            finally:
+                osservatore.chiudi()
+            os.rmdir(os.path.join(self.source, "n"))
+
+    def _osserva(self, use_inotify):
+        #La sorgente con il separatore finale fa arrivare a os.walk la radice in quella forma
+        syncer = FolderSynchronizer(os.path.join(self.source, ""), self.destination, quiet=True)
+        stop_event = threading.Event()
+        thread = threading.Thread(target=syncer.watch,
+                                  kwargs={"debounce": 0.2, "poll_interval": 0.2, "use_inotify": use_inotify,
+                                          "stop_event": stop_event})
+
+        with redirect_stdout(StringIO()):
+            thread.start()
+            time.sleep(1.0)  #Sincronizzazione iniziale completata
+
+            os.makedirs(os.path.join(self.source, "n", "m"))
+            with open(os.path.join(self.source, "n", "m", "h2"), "w") as f:
+                f.write("contenuto")
+
+            copia = os.path.join(self.destination, "n", "m", "h2")
+            scadenza = time.monotonic() + 10
+            while not os.path.isfile(copia) and time.monotonic() < scadenza:
+                time.sleep(0.1)
+            time.sleep(0.5)  #Eventuali copie duplicate dello stesso file
+
+            stop_event.set()
+            thread.join(10)
+
+        self.assertFalse(thread.is_alive())
+        with open(copia) as f:
+            self.assertEqual(f.read(), "contenuto")
+        self.assertEqual(syncer.errors, [])
+        self.assertEqual(syncer.files_copied, 1)
+
+    @unittest.skipIf(folder_sync.libc is None, "inotify non disponibile")
+    def test_cartella_annidata_inotify(self):
+        self._osserva(use_inotify=True)
+
+    def test_cartella_annidata_polling(self):
+        self._osserva(use_inotify=False)
+
+
+if __name__ == "__main__":
+    unittest.main()